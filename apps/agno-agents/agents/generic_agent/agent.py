@@ -82,7 +82,7 @@ async def process_user_query(step_input):
             )
         
         # Make API call to the selected model
-        response = model_manager.chat_completion(
+        response = await model_manager.chat_completion(
             messages=[msg.__dict__ if hasattr(msg, '__dict__') else msg for msg in messages],
             tools=generic_tools
         )
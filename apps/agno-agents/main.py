@@ -18,6 +18,9 @@ from dotenv import load_dotenv
 from fastapi import FastAPI, HTTPException, Form
 from fastapi.middleware.cors import CORSMiddleware
 
+# Load environment variables before the shared modules read them at import
+load_dotenv()
+
 # Import the base agent system
 from shared.agent_base import agent_registry, AgentConfig, AgentType, get_agent_route, get_agent_id_from_route
 from shared.rate_limiter import rate_limiter, RateLimitConfig, RateLimitType
@@ -37,9 +40,6 @@ from agents.stock_agent.handler import StockAnalysisAgentHandler, create_stock_a
 from agents.ringi_agent.handler import RingiAgentHandler, create_ringi_agent_config
 from agents.generic_agent.handler import GenericAgentHandler, create_generic_agent_config
 
-# Load environment variables
-load_dotenv()
-
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -100,7 +100,7 @@ async def system_health():
     dependencies, and system metrics.
     """
     try:
-        health_data = agent_registry.get_system_health()
+        health_data = await agent_registry.get_system_health()
         
         # Add system-level information
         health_data.update({
@@ -150,7 +150,7 @@ async def agent_health(agent_id: str):
         if not agent:
             raise HTTPException(status_code=404, detail="Agent not found")
         
-        health_data = agent.get_health_status()
+        health_data = await agent.get_health_status()
         
         # Add agent-specific endpoints
         health_data["endpoints"] = {
@@ -189,7 +189,7 @@ async def readiness_check():
     503 if not ready.
     """
     try:
-        health_data = agent_registry.get_system_health()
+        health_data = await agent_registry.get_system_health()
         
         # System is ready if at least one agent is healthy
         is_ready = health_data["healthy_agents"] > 0
@@ -15,15 +15,27 @@ all common infrastructure from this base system.
 """
 
 import asyncio
+import contextlib
+import functools
 import json
 import logging
+import math
+import os
 import time
-import uuid
 from abc import ABC, abstractmethod
-from typing import Any, Dict, List, Optional, Type, Union, Callable
+from collections import ChainMap, deque
+from typing import Any, Dict, List, Mapping, Optional, Tuple, Type, Union, Callable
 from dataclasses import dataclass
+from datetime import datetime
 from enum import Enum
 
+try:
+    import psutil
+    _PSUTIL_OK = True
+except ImportError:
+    psutil = None
+    _PSUTIL_OK = False
+
 from fastapi import FastAPI, HTTPException, Request
 from fastapi.responses import StreamingResponse
 from agno.workflow.v2 import Workflow, StepOutput
@@ -41,7 +53,6 @@ from ag_ui.core import (
     ToolCallEndEvent,
     ToolCallStartEvent,
 )
-from ag_ui.encoder import EventEncoder
 from .rate_limiter import rate_limiter, RateLimitConfig, RateLimitType, CircuitBreaker
 from auth.clerk_idp_manager import clerk_idp_manager
 
@@ -49,6 +60,86 @@ logger = logging.getLogger(__name__)
 
 # Constants
 AGENTS_PREFIX = "/agents"
+FORWARDED_FOR_HEADER = "X-Forwarded-For"
+REAL_IP_HEADER = "X-Real-IP"
+HEALTH_PROBE_TIMEOUT = 2.0  # Per-agent timeout for system health probes (seconds)
+HEALTH_CHECK_TTL = 5.0  # How long dependency health results are reused (seconds)
+
+# Sentinel queued by the workflow task's done callback to end the event stream
+_STREAM_DONE = object()
+
+# Last formatted timestamp as [monotonic_time, iso_string]; refreshed at most every 100ms
+_TS_CACHE = [0.0, ""]
+_TS_CACHE_TTL = 0.1
+
+# psutil handles reused across health checks; virtual memory is cached as (monotonic_time, vmem)
+_PSUTIL_PROC = psutil.Process() if _PSUTIL_OK else None
+_VMEM_CACHE = (0.0, None)
+_VMEM_CACHE_TTL = 1.0
+
+
+def _new_id() -> str:
+    """Generate an opaque random ID for requests and messages"""
+    return os.urandom(16).hex()
+
+
+def _encode_event(event) -> bytes:
+    """Serialize an AG-UI event to an SSE frame as bytes
+    
+    Same output as ag_ui's EventEncoder, but pydantic's serializer writes JSON
+    bytes directly so there is no intermediate str for Starlette to re-encode.
+    """
+    return b"data: " + event.__pydantic_serializer__.to_json(event, by_alias=True, exclude_none=True) + b"\n\n"
+
+
+_DELTA_PLACEHOLDER = "__agent_delta__"
+
+
+def _content_frame_template(encode: Callable[[Any], bytes], message_id: str) -> Tuple[bytes, bytes]:
+    """Split a serialized TEXT_MESSAGE_CONTENT frame around its delta value"""
+    frame = encode(
+        TextMessageContentEvent(
+            type=EventType.TEXT_MESSAGE_CONTENT,
+            message_id=message_id,
+            delta=_DELTA_PLACEHOLDER,
+        )
+    )
+    prefix, _, suffix = frame.partition(f'"{_DELTA_PLACEHOLDER}"'.encode())
+    return prefix, suffix
+
+
+def cached_health(ttl: float = 5.0):
+    """Cache an async health check on the handler for `ttl` seconds.
+    
+    Concurrent callers share a single in-flight probe instead of each
+    starting their own, so probe rate stays bounded regardless of poll rate.
+    """
+    def decorator(func):
+        attr = f"_health_cache_{func.__name__}"
+        
+        def finish(self, task: asyncio.Task):
+            # Cache the result; a failed probe is dropped so the next caller retries
+            if task.cancelled() or task.exception() is not None:
+                setattr(self, attr, (None, 0.0, None))
+            else:
+                setattr(self, attr, (task.result(), time.monotonic() + ttl, None))
+        
+        @functools.wraps(func)
+        async def wrapper(self):
+            # Cache entry is (value, expiry, inflight_task)
+            value, expiry, inflight = getattr(self, attr, (None, 0.0, None))
+            if inflight is None:
+                if time.monotonic() < expiry:
+                    return value
+                # The probe runs in its own task, so a caller cancelled by a timeout or
+                # a client disconnect doesn't cancel it for the other waiters
+                inflight = asyncio.ensure_future(func(self))
+                setattr(self, attr, (value, expiry, inflight))
+                inflight.add_done_callback(functools.partial(finish, self))
+            return await asyncio.shield(inflight)
+        
+        return wrapper
+    return decorator
 
 
 def get_agent_route(agent_id: str) -> str:
@@ -99,11 +190,27 @@ class AgentConfig:
 class AgentRequestContext:
     """Context object passed to agents containing request metadata"""
     
+    __slots__ = (
+        "request",
+        "input_data",
+        "config",
+        "request_id",
+        "start_time",
+        "user_id",
+        "session_id",
+        "client_id",
+        "scope",
+        "org_id",
+        "org_name",
+        "org_role",
+        "org_permissions",
+    )
+    
     def __init__(self, request: Request, input_data: RunAgentInput, config: AgentConfig):
         self.request = request
         self.input_data = input_data
         self.config = config
-        self.request_id = str(uuid.uuid4())
+        self.request_id = _new_id()
         self.start_time = time.time()
         self.user_id = self._extract_user_id()
         self.session_id = self._extract_session_id()
@@ -171,24 +278,175 @@ class AgentTracer:
         })
 
 
+class AdmissionController:
+    """AIMD concurrency limit for workflow execution
+    
+    The limit grows additively while recent workflow latency stays under the
+    target and is cut multiplicatively when latency degrades or a provider
+    signals overload (429/5xx), so the process stops piling up tasks when
+    upstream model APIs push back. A latency-driven cut needs a full window of
+    fresh samples, so one burst of slow runs costs a single halving.
+    """
+    
+    def __init__(
+        self,
+        initial_limit: float = 16,
+        min_limit: float = 1,
+        max_limit: float = 128,
+        target_latency: float = 120.0,  # Multi-step LLM workflows routinely take tens of seconds
+        increase: float = 1.0,
+        decrease: float = 0.5,
+        window: int = 50,
+        queue_timeout: float = 30.0
+    ):
+        self.limit = initial_limit
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.target_latency = target_latency
+        self.increase = increase
+        self.decrease = decrease
+        self.queue_timeout = queue_timeout
+        self.in_flight = 0
+        self._latencies = deque(maxlen=window)
+        self._condition: Optional[asyncio.Condition] = None
+    
+    async def acquire(self) -> "AdmissionSlot":
+        """Wait up to queue_timeout for a free slot, else reject with 503"""
+        if self._condition is None:
+            self._condition = asyncio.Condition()
+        condition = self._condition
+        
+        async with condition:
+            try:
+                await asyncio.wait_for(
+                    condition.wait_for(lambda: self.in_flight < max(1, int(self.limit))),
+                    self.queue_timeout
+                )
+            except asyncio.TimeoutError:
+                raise HTTPException(
+                    status_code=503,
+                    detail="Agent is at capacity, please retry shortly",
+                    headers={"Retry-After": str(math.ceil(self.queue_timeout))}
+                )
+            self.in_flight += 1
+        return AdmissionSlot(self)
+    
+    async def _release(self):
+        async with self._condition:
+            self.in_flight -= 1
+            self._condition.notify_all()
+    
+    def on_success(self, latency: float):
+        """Additive increase while mean latency is under target, else back off once per window"""
+        self._latencies.append(latency)
+        mean_latency = sum(self._latencies) / len(self._latencies)
+        if mean_latency < self.target_latency:
+            self.limit = min(self.max_limit, self.limit + self.increase)
+        elif len(self._latencies) == self._latencies.maxlen:
+            self.limit = max(self.min_limit, self.limit * self.decrease)
+            self._latencies.clear()
+    
+    def on_error(self):
+        """Multiplicative decrease on provider overload"""
+        self.limit = max(self.min_limit, self.limit * self.decrease)
+        self._latencies.clear()
+        logger.warning(f"⚠️ Provider overload - workflow concurrency limit reduced to {self.limit:.1f}")
+
+
+class AdmissionSlot:
+    """A slot held from admission until the workflow that claimed it finishes"""
+    
+    __slots__ = ("_controller", "_released", "claimed")
+    
+    def __init__(self, controller: AdmissionController):
+        self._controller = controller
+        self._released = False
+        self.claimed = False  # Set once a workflow task owns the slot
+    
+    async def release(self):
+        """Return the slot; safe to call more than once"""
+        if not self._released:
+            self._released = True
+            await self._controller._release()
+    
+    @contextlib.asynccontextmanager
+    async def track(self):
+        """Record the outcome of the wrapped workflow run, then release the slot"""
+        controller = self._controller
+        start = time.monotonic()
+        try:
+            yield
+        except Exception as e:
+            if _is_overload_error(e):
+                controller.on_error()
+            raise
+        else:
+            controller.on_success(time.monotonic() - start)
+        finally:
+            await self.release()
+
+
+class _AdmissionStreamingResponse(StreamingResponse):
+    """StreamingResponse that frees its admission slot if no workflow ever claimed it"""
+    
+    def __init__(self, content, slot: AdmissionSlot, **kwargs):
+        super().__init__(content, **kwargs)
+        self._slot = slot
+    
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            # A client that disconnects before streaming starts never runs the workflow
+            if not self._slot.claimed:
+                await self._slot.release()
+
+
+def _is_overload_error(error: Exception) -> bool:
+    """Whether an error signals upstream overload (HTTP 429 or 5xx)"""
+    status = getattr(error, "status_code", None)
+    if status is None:
+        status = getattr(getattr(error, "response", None), "status_code", None)
+    return isinstance(status, int) and (status == 429 or status >= 500)
+
+
 class BaseAgentHandler(ABC):
     """Base class for all agent handlers"""
     
     def __init__(self, config: AgentConfig):
         self.config = config
-        self.tracer = AgentTracer()
+        self._agent_id = get_agent_id_from_route(config.route)
+        self._rl_limit_str = (
+            str(config.rate_limit_config.requests_per_minute) if config.rate_limit_config else ""
+        )
         
         # Initialize performance tracking
         self._total_requests = 0
         self._successful_requests = 0
         self._failed_requests = 0
-        self._response_times = []
+        self._response_times = deque(maxlen=100)
+        self._response_times_sum = 0.0  # Running sum of _response_times for O(1) averages
         self._last_activity = None
-        self._recent_errors = []
+        self._recent_errors = deque(maxlen=10)
         self._start_time = time.time()
         
         # Initialize circuit breaker
         self._circuit_breaker = CircuitBreaker()
+        
+        # Per-agent admission so one slow agent or provider doesn't throttle the others
+        self._admission = AdmissionController()
+        
+        # Discovery metadata only depends on config, so compute it once
+        self._cached_tools = tuple(self._compute_agent_tools())
+        self._cached_models = tuple(self._compute_agent_models())
+        self._cached_capabilities = tuple(self._compute_agent_capabilities())
+        self._cached_supported_events = tuple(self._compute_supported_events())
+        self._static_metadata = {
+            "capabilities": self._cached_capabilities,
+            "supported_events": self._cached_supported_events,
+            "tools": self._cached_tools,
+            "models": self._cached_models,
+        }
     
     async def handle_request(self, request: Request, input_data: RunAgentInput) -> StreamingResponse:
         """
@@ -214,32 +472,49 @@ class BaseAgentHandler(ABC):
         try:
             # Start tracing
             logger.info("🔍 Starting request tracing...")
-            self.tracer.start_trace(context)
+            AgentTracer.start_trace(context)
             
             # Check circuit breaker
             logger.info("🔍 Checking circuit breaker...")
             if self._circuit_breaker.is_open():
                 raise HTTPException(status_code=503, detail="Service temporarily unavailable due to high error rate")
             
-            # Check rate limits
-            logger.info("🔍 Checking rate limits...")
-            await self._check_rate_limits(context)
-            
-            # Validate request
+            # Validate request (local, cheap) before any I/O-bound guard
             logger.info("🔍 Validating request...")
             await self._validate_request(context)
             
-            # Check authentication if required
             if self.config.requires_auth:
-                logger.info("🔍 Authentication required - starting authentication...")
+                # Per-IP limit before auth so floods of missing or invalid tokens never
+                # reach the IDP; user-scoped limits need the authenticated user id and
+                # run after it, so rejected callers take no user or agent quota
+                logger.info("🔍 Checking IP rate limit...")
+                await self._check_rate_limits(context, user_scoped=False)
+                
+                logger.info("🔍 Authenticating request...")
                 await self._authenticate_request(context)
+                
+                logger.info("🔍 Checking rate limits...")
+                await self._check_rate_limits(context, ip_scoped=False)
             else:
-                logger.info("🔍 No authentication required")
+                logger.info("🔍 Checking rate limits...")
+                await self._check_rate_limits(context)
+            
+            # Wait for a workflow slot (bounded; 503 when the agent stays saturated)
+            slot = await self._admission.acquire()
             
             # Create streaming response
             logger.info("🔍 Creating streaming response...")
-            return await self._create_streaming_response(context)
+            try:
+                return await self._create_streaming_response(context, slot)
+            except BaseException:
+                await slot.release()
+                raise
             
+        except HTTPException:
+            # Deliberate client-facing errors (400/401/429/503) keep their status code
+            # and don't count against the circuit breaker
+            self._failed_requests += 1
+            raise
         except Exception as e:
             # Track failure
             self._failed_requests += 1
@@ -248,8 +523,6 @@ class BaseAgentHandler(ABC):
                 "error": str(e),
                 "request_id": context.request_id
             })
-            # Keep only last 10 errors
-            self._recent_errors = self._recent_errors[-10:]
             
             # Record failure in circuit breaker
             self._circuit_breaker.record_failure()
@@ -262,8 +535,9 @@ class BaseAgentHandler(ABC):
             logger.error(f"   Headers: {dict(context.request.headers)}")
             logger.error(f"   Input data: {context.input_data}")
             
-            self.tracer.log_error(context, e, "request_handling")
-            raise HTTPException(status_code=500, detail=f"Agent processing failed: {str(e)}")
+            AgentTracer.log_error(context, e, "request_handling")
+            # Details are logged above; don't echo the exception back to the client
+            raise HTTPException(status_code=500, detail="Agent processing failed")
     
     async def _validate_request(self, context: AgentRequestContext):
         """Validate the incoming request"""
@@ -303,9 +577,11 @@ class BaseAgentHandler(ABC):
                     else:
                         logger.error("🔐 Token validation failed - user_info is None")
                         raise HTTPException(status_code=401, detail="Invalid or expired token")
+                except HTTPException:
+                    raise
                 except Exception as e:
                     logger.error(f"🔐 Token validation error: {type(e).__name__}: {str(e)}")
-                    raise HTTPException(status_code=401, detail=f"Token validation failed: {str(e)}")
+                    raise HTTPException(status_code=401, detail="Token validation failed")
             else:
                 logger.error("🔐 No valid Authorization header found")
                 raise HTTPException(status_code=401, detail="Authentication required")
@@ -317,50 +593,69 @@ class BaseAgentHandler(ABC):
         await self.authenticate_request(context)
         logger.info("🔐 Agent-specific authentication completed")
     
-    async def _create_streaming_response(self, context: AgentRequestContext) -> StreamingResponse:
+    async def _create_streaming_response(self, context: AgentRequestContext, slot: AdmissionSlot) -> StreamingResponse:
         """Create the streaming response with event handling"""
         
         async def event_generator():
             try:
                 # Initialize streaming infrastructure
-                encoder = EventEncoder()
-                event_queue = asyncio.Queue()
-                message_id = str(uuid.uuid4())
+                encode = _encode_event
+                # Single producer (workflow) / single consumer (this generator):
+                # a plain deque plus a wakeup event avoids asyncio.Queue locking
+                pending_events = deque()
+                wakeup = asyncio.Event()
+                message_id = _new_id()
                 
-                # Define event emission callback
+                # Define event emission callback; events are serialized to SSE bytes
+                # once here so the consumer only has to yield them
                 def emit_event(event):
-                    event_queue.put_nowait(event)
+                    pending_events.append(encode(event))
+                    wakeup.set()
                 
-                # Send initial events
-                yield encoder.encode(
+                # Send run start and state snapshot as a single chunk (one write)
+                snapshot = self._get_initial_state(context)
+                if not isinstance(snapshot, dict):
+                    snapshot = dict(snapshot)
+                yield encode(
                     RunStartedEvent(
                         type=EventType.RUN_STARTED,
                         thread_id=context.input_data.thread_id,
                         run_id=context.input_data.run_id,
                     )
-                )
-                
-                # Send state snapshot
-                yield encoder.encode(
+                ) + encode(
                     StateSnapshotEvent(
                         type=EventType.STATE_SNAPSHOT,
-                        snapshot=self._get_initial_state(context),
+                        snapshot=snapshot,
                     )
                 )
                 
-                # Execute agent workflow
+                # Execute agent workflow; the task owns the admission slot from here on
+                slot.claimed = True
                 agent_task = asyncio.create_task(
-                    self._execute_workflow(context, emit_event)
+                    self._execute_workflow(context, emit_event, slot)
                 )
                 
-                # Stream events while workflow runs
-                while True:
-                    try:
-                        event = await asyncio.wait_for(event_queue.get(), timeout=0.1)
-                        yield encoder.encode(event)
-                    except asyncio.TimeoutError:
-                        if agent_task.done():
+                # Completion is signalled in-band, after every event the workflow emitted
+                def on_workflow_done(_):
+                    pending_events.append(_STREAM_DONE)
+                    wakeup.set()
+                
+                agent_task.add_done_callback(on_workflow_done)
+                
+                # Bind hot-loop lookups to locals
+                next_event = pending_events.popleft
+                
+                # Stream events while workflow runs, draining everything queued per wakeup
+                streaming = True
+                while streaming:
+                    await wakeup.wait()
+                    wakeup.clear()
+                    while pending_events:
+                        chunk = next_event()
+                        if chunk is _STREAM_DONE:
+                            streaming = False
                             break
+                        yield chunk
                 
                 # Process final results
                 try:
@@ -376,12 +671,12 @@ class BaseAgentHandler(ABC):
                             if messages:
                                 last_message = messages[-1]
                                 # Emit message events
-                                async for event in self._emit_message_events(last_message, encoder, message_id):
+                                async for event in self._emit_message_events(last_message, encode, message_id):
                                     yield event
                 except Exception as e:
-                    self.tracer.log_error(context, e, "result_processing")
+                    AgentTracer.log_error(context, e, "result_processing")
                     # Emit error message
-                    yield encoder.encode(
+                    yield encode(
                         TextMessageContentEvent(
                             type=EventType.TEXT_MESSAGE_CONTENT,
                             message_id=message_id,
@@ -390,7 +685,7 @@ class BaseAgentHandler(ABC):
                     )
                 
                 # Send completion event
-                yield encoder.encode(
+                yield encode(
                     RunFinishedEvent(
                         type=EventType.RUN_FINISHED,
                         thread_id=context.input_data.thread_id,
@@ -399,8 +694,8 @@ class BaseAgentHandler(ABC):
                 )
                 
             except Exception as e:
-                self.tracer.log_error(context, e, "streaming")
-                yield encoder.encode(
+                AgentTracer.log_error(context, e, "streaming")
+                yield _encode_event(
                     TextMessageContentEvent(
                         type=EventType.TEXT_MESSAGE_CONTENT,
                         message_id=message_id,
@@ -411,85 +706,92 @@ class BaseAgentHandler(ABC):
                 # Track success and performance
                 duration = time.time() - context.start_time
                 self._successful_requests += 1
-                self._response_times.append(duration)
-                # Keep only last 100 response times
-                self._response_times = self._response_times[-100:]
+                self._record_response_time(duration)
                 
                 # Record success in circuit breaker
                 self._circuit_breaker.record_success()
                 
                 # End tracing
-                self.tracer.end_trace(context, True, duration)
+                AgentTracer.end_trace(context, True, duration)
         
-        return StreamingResponse(event_generator(), media_type="text/event-stream")
+        return _AdmissionStreamingResponse(event_generator(), slot, media_type="text/event-stream")
     
     def _get_initial_state(self, context: AgentRequestContext) -> Dict[str, Any]:
         """Get initial state for the agent"""
-        base_state = context.input_data.state.copy()
-        
-        # Merge with default state
-        if self.config.default_state:
-            base_state.update(self.config.default_state)
-        
-        # Add common fields
-        base_state.update({
-            "tool_logs": [],
-            "request_id": context.request_id,
-        })
+        # Layer common fields over default state over input state without copying;
+        # lookups fall through left to right, writes only touch the leftmost map
+        base_state = ChainMap(
+            {
+                "tool_logs": [],
+                "request_id": context.request_id,
+            },
+            self.config.default_state or {},
+            context.input_data.state or {},
+        )
         
         # Agent-specific initial state
         return self.get_initial_state(context, base_state)
     
-    async def _execute_workflow(self, context: AgentRequestContext, emit_event: Callable):
+    async def _execute_workflow(self, context: AgentRequestContext, emit_event: Callable, slot: AdmissionSlot):
         """Execute the agent workflow"""
         logger.info("🔍 Preparing workflow execution...")
-        additional_data = {
-            "tools": context.input_data.tools,
-            "messages": context.input_data.messages,
-            "emit_event": emit_event,
-            "context": context,
-            "request_id": context.request_id,
-            "tool_logs": [],  # Initialize tool_logs array
-        }
-        
-        # Merge with agent-specific data
-        logger.info("🔍 Getting agent-specific workflow data...")
-        agent_data = self.get_workflow_data(context)
-        additional_data.update(agent_data)
+        try:
+            additional_data = {
+                "tools": context.input_data.tools,
+                "messages": context.input_data.messages,
+                "emit_event": emit_event,
+                "context": context,
+                "request_id": context.request_id,
+                "tool_logs": [],  # Initialize tool_logs array
+            }
+            
+            # Merge with agent-specific data
+            logger.info("🔍 Getting agent-specific workflow data...")
+            agent_data = self.get_workflow_data(context)
+            additional_data.update(agent_data)
+        except BaseException:
+            # slot.track() below releases on every other path
+            await slot.release()
+            raise
         
         logger.info(f"🔍 Starting workflow execution with data: {additional_data}")
-        result = await self.config.workflow.arun(additional_data=additional_data)
+        async with slot.track():
+            result = await self.config.workflow.arun(additional_data=additional_data)
         logger.info(f"🔍 Workflow execution completed with result: {result}")
         return result
     
     
-    async def _emit_message_events(self, message, encoder, message_id):
+    async def _emit_message_events(self, message, encode, message_id):
         """Emit events for the final message"""
         if hasattr(message, 'tool_calls') and message.tool_calls:
             # Handle tool call responses
-            yield encoder.encode(
+            yield encode(
                 ToolCallStartEvent(
                     type=EventType.TOOL_CALL_START,
                     tool_call_id=message.tool_calls[0].id,
                     toolCallName=message.tool_calls[0].function.name,
                 )
             )
-            yield encoder.encode(
+            yield encode(
                 ToolCallArgsEvent(
                     type=EventType.TOOL_CALL_ARGS,
                     tool_call_id=message.tool_calls[0].id,
                     delta=message.tool_calls[0].function.arguments,
                 )
             )
-            yield encoder.encode(
+            yield encode(
                 ToolCallEndEvent(
                     type=EventType.TOOL_CALL_END,
                     tool_call_id=message.tool_calls[0].id,
                 )
             )
         else:
+            # Bind hot-loop lookups to locals
+            dumps = json.dumps
+            sleep = asyncio.sleep
+            
             # Handle text message responses
-            yield encoder.encode(
+            yield encode(
                 TextMessageStartEvent(
                     type=EventType.TEXT_MESSAGE_START,
                     message_id=message_id,
@@ -504,17 +806,14 @@ class BaseAgentHandler(ABC):
                 part_length = max(1, len(content) // n_parts)
                 parts = [content[i : i + part_length] for i in range(0, len(content), part_length)]
                 
+                # Event type and message ID are identical for every chunk, so serialize
+                # them once and only JSON-encode the delta per chunk
+                prefix, suffix = _content_frame_template(encode, message_id)
                 for part in parts:
-                    yield encoder.encode(
-                        TextMessageContentEvent(
-                            type=EventType.TEXT_MESSAGE_CONTENT,
-                            message_id=message_id,
-                            delta=part,
-                        )
-                    )
-                    await asyncio.sleep(0.05)
+                    yield prefix + dumps(part, ensure_ascii=False).encode() + suffix
+                    await sleep(0.05)
             
-            yield encoder.encode(
+            yield encode(
                 TextMessageEndEvent(
                     type=EventType.TEXT_MESSAGE_END,
                     message_id=message_id,
@@ -533,8 +832,12 @@ class BaseAgentHandler(ABC):
         pass
     
     @abstractmethod
-    def get_initial_state(self, context: AgentRequestContext, base_state: Dict[str, Any]) -> Dict[str, Any]:
-        """Get initial state specific to this agent"""
+    def get_initial_state(self, context: AgentRequestContext, base_state: Mapping[str, Any]) -> Dict[str, Any]:
+        """Get initial state specific to this agent
+        
+        base_state is a read-through ChainMap over the request state; build a new
+        dict (e.g. {**base_state, ...}) rather than mutating the underlying maps.
+        """
         pass
     
     @abstractmethod
@@ -545,17 +848,18 @@ class BaseAgentHandler(ABC):
     def get_dynamic_metadata(self) -> Dict[str, Any]:
         """Get dynamic metadata for agent discovery"""
         return {
-            "capabilities": self._get_agent_capabilities(),
-            "supported_events": self._get_supported_events(),
-            "tools": self._get_agent_tools(),
-            "models": self._get_agent_models(),
+            **self._static_metadata,
             "status": self._get_agent_status(),
             "uptime": self._get_agent_uptime(),
             "last_updated": self._get_last_updated()
         }
     
-    def _get_agent_capabilities(self) -> List[str]:
+    def _get_agent_capabilities(self) -> Tuple[str, ...]:
         """Get agent-specific capabilities"""
+        return self._cached_capabilities
+    
+    def _compute_agent_capabilities(self) -> List[str]:
+        """Compute agent-specific capabilities from config"""
         base_capabilities = [
             "interactive-communication",
             "real-time-streaming",
@@ -589,8 +893,12 @@ class BaseAgentHandler(ABC):
         
         return list(set(base_capabilities))  # Remove duplicates
     
-    def _get_supported_events(self) -> List[str]:
+    def _get_supported_events(self) -> Tuple[str, ...]:
         """Get events this agent actually supports"""
+        return self._cached_supported_events
+    
+    def _compute_supported_events(self) -> List[str]:
+        """Compute events this agent supports from config"""
         base_events = [
             "RUN_STARTED",
             "RUN_FINISHED"
@@ -619,8 +927,12 @@ class BaseAgentHandler(ABC):
         
         return list(set(base_events))
     
-    def _get_agent_tools(self) -> List[Dict[str, Any]]:
+    def _get_agent_tools(self) -> Tuple[Dict[str, Any], ...]:
         """Get tools available to this agent"""
+        return self._cached_tools
+    
+    def _compute_agent_tools(self) -> List[Dict[str, Any]]:
+        """Compute tools available to this agent from config"""
         tools = []
         
         if hasattr(self, 'config') and self.config.tools:
@@ -631,8 +943,12 @@ class BaseAgentHandler(ABC):
         
         return tools
     
-    def _get_agent_models(self) -> List[Dict[str, Any]]:
+    def _get_agent_models(self) -> Tuple[Dict[str, Any], ...]:
         """Get models available to this agent"""
+        return self._cached_models
+    
+    def _compute_agent_models(self) -> List[Dict[str, Any]]:
+        """Compute models available to this agent from config"""
         models = []
         
         if hasattr(self, 'config') and self.config.models:
@@ -660,14 +976,19 @@ class BaseAgentHandler(ABC):
             return time.time() - self._start_time
         return None
     
-    def _get_last_updated(self) -> str:
-        """Get last updated timestamp"""
-        from datetime import datetime
-        return datetime.utcnow().isoformat()
+    def _get_last_updated(self, precise: bool = False) -> str:
+        """Get last updated timestamp (cached at ~100ms granularity unless precise)"""
+        if precise:
+            return datetime.utcnow().isoformat()
+        now = time.monotonic()
+        if now - _TS_CACHE[0] > _TS_CACHE_TTL:
+            _TS_CACHE[0] = now
+            _TS_CACHE[1] = datetime.utcnow().isoformat()
+        return _TS_CACHE[1]
     
     def _has_tools(self) -> bool:
         """Check if agent has tools"""
-        return bool(self._get_agent_tools())
+        return bool(self._cached_tools)
     
     def _extract_tools_from_workflow(self) -> List[Dict[str, Any]]:
         """Extract tools from workflow definition"""
@@ -680,7 +1001,7 @@ class BaseAgentHandler(ABC):
             pass
         return tools
     
-    def get_health_status(self) -> Dict[str, Any]:
+    async def get_health_status(self) -> Dict[str, Any]:
         """Get comprehensive health status for this agent"""
         return {
             "agent_id": self.config.route.lstrip('/'),
@@ -688,10 +1009,10 @@ class BaseAgentHandler(ABC):
             "uptime": self._get_agent_uptime(),
             "last_activity": self._get_last_activity(),
             "memory_usage": self._get_memory_usage(),
-            "dependencies": self._check_dependencies(),
+            "dependencies": await self._check_dependencies(),
             "performance": self._get_performance_metrics(),
             "errors": self._get_recent_errors(),
-            "timestamp": self._get_last_updated()
+            "timestamp": self._get_last_updated(precise=True)
         }
     
     def _get_last_activity(self) -> Optional[str]:
@@ -702,29 +1023,48 @@ class BaseAgentHandler(ABC):
     
     def _get_memory_usage(self) -> Dict[str, Any]:
         """Get memory usage information"""
+        global _VMEM_CACHE
+        if not _PSUTIL_OK:
+            return {"error": "psutil not available"}
         try:
-            import psutil
-            process = psutil.Process()
-            memory_info = process.memory_info()
+            memory_info = _PSUTIL_PROC.memory_info()
+            
+            now = time.monotonic()
+            cached_at, vmem = _VMEM_CACHE
+            if vmem is None or now - cached_at > _VMEM_CACHE_TTL:
+                vmem = psutil.virtual_memory()
+                _VMEM_CACHE = (now, vmem)
+            
             return {
                 "rss": memory_info.rss,  # Resident Set Size
                 "vms": memory_info.vms,  # Virtual Memory Size
-                "percent": process.memory_percent(),
-                "available": psutil.virtual_memory().available
+                # Same formula as Process.memory_percent(), without a second virtual_memory() read
+                "percent": (memory_info.rss / vmem.total) * 100 if vmem.total else 0.0,
+                "available": vmem.available
             }
-        except ImportError:
-            return {"error": "psutil not available"}
         except Exception as e:
             return {"error": str(e)}
     
-    def _check_dependencies(self) -> Dict[str, Any]:
-        """Check health of agent dependencies"""
-        dependencies = {
-            "workflow": self._check_workflow_health(),
-            "models": self._check_model_health(),
-            "storage": self._check_storage_health(),
-            "external_apis": self._check_external_apis()
-        }
+    async def _check_dependencies(self) -> Dict[str, Any]:
+        """Check health of agent dependencies concurrently"""
+        names = ("workflow", "models", "storage", "external_apis")
+        results = await asyncio.gather(
+            self._check_workflow_health(),
+            self._check_model_health(),
+            self._check_storage_health(),
+            self._check_external_apis(),
+            return_exceptions=True
+        )
+        
+        dependencies = {}
+        for name, result in zip(names, results):
+            # BaseException too: a cancelled probe comes back as CancelledError
+            if isinstance(result, BaseException):
+                result = {
+                    "status": "unhealthy",
+                    "message": f"{name} check failed: {str(result)}"
+                }
+            dependencies[name] = result
         
         # Overall dependency health
         all_healthy = all(
@@ -741,7 +1081,7 @@ class BaseAgentHandler(ABC):
         
         return dependencies
     
-    def _check_workflow_health(self) -> Dict[str, Any]:
+    async def _check_workflow_health(self) -> Dict[str, Any]:
         """Check if workflow is properly configured"""
         try:
             if hasattr(self, 'config') and self.config.workflow:
@@ -761,7 +1101,8 @@ class BaseAgentHandler(ABC):
                 "message": f"Workflow check failed: {str(e)}"
             }
     
-    def _check_model_health(self) -> Dict[str, Any]:
+    @cached_health(ttl=HEALTH_CHECK_TTL)
+    async def _check_model_health(self) -> Dict[str, Any]:
         """Check if AI models are accessible"""
         try:
             # This would check actual model connectivity
@@ -777,7 +1118,8 @@ class BaseAgentHandler(ABC):
                 "message": f"Model check failed: {str(e)}"
             }
     
-    def _check_storage_health(self) -> Dict[str, Any]:
+    @cached_health(ttl=HEALTH_CHECK_TTL)
+    async def _check_storage_health(self) -> Dict[str, Any]:
         """Check storage backend health"""
         try:
             # This would check actual storage connectivity
@@ -791,7 +1133,8 @@ class BaseAgentHandler(ABC):
                 "message": f"Storage check failed: {str(e)}"
             }
     
-    def _check_external_apis(self) -> Dict[str, Any]:
+    @cached_health(ttl=HEALTH_CHECK_TTL)
+    async def _check_external_apis(self) -> Dict[str, Any]:
         """Check external API dependencies"""
         try:
             # This would check external API connectivity
@@ -805,6 +1148,14 @@ class BaseAgentHandler(ABC):
                 "message": f"External API check failed: {str(e)}"
             }
     
+    def _record_response_time(self, duration: float):
+        """Append a response time, keeping the running sum in step with deque eviction"""
+        times = self._response_times
+        if len(times) == times.maxlen:
+            self._response_times_sum -= times[0]
+        times.append(duration)
+        self._response_times_sum += duration
+    
     def _get_performance_metrics(self) -> Dict[str, Any]:
         """Get performance metrics for this agent"""
         total_requests = self._total_requests
@@ -815,7 +1166,7 @@ class BaseAgentHandler(ABC):
         avg_response_time = 0
         last_response_time = 0
         if self._response_times:
-            avg_response_time = sum(self._response_times) / len(self._response_times)
+            avg_response_time = self._response_times_sum / len(self._response_times)
             last_response_time = self._response_times[-1]
         
         metrics = {
@@ -837,83 +1188,84 @@ class BaseAgentHandler(ABC):
     
     def _get_recent_errors(self) -> List[Dict[str, Any]]:
         """Get recent errors for this agent"""
-        return getattr(self, '_recent_errors', [])
+        return list(getattr(self, '_recent_errors', []))
     
-    async def _check_rate_limits(self, context: AgentRequestContext):
-        """Check rate limits for the request"""
+    async def _check_rate_limits(
+        self,
+        context: AgentRequestContext,
+        ip_scoped: bool = True,
+        user_scoped: bool = True
+    ):
+        """Check rate limits for the request: the IP scope, the user/agent scopes, or both"""
         if not self.config.rate_limit_config or not self.config.rate_limit_config.enabled:
             return
         
-        # Get user ID and IP for rate limiting
-        user_id = context.user_id or "anonymous"
-        client_ip = self._get_client_ip(context.request)
+        config = self.config.rate_limit_config
+        windows = []
+        buckets = []
+        scopes = []
         
-        # Check user rate limit
-        user_result = await rate_limiter.check_rate_limit(
-            RateLimitType.USER,
-            user_id,
-            self.config.rate_limit_config
-        )
+        if user_scoped:
+            user_id = context.user_id or "anonymous"
+            windows.append((RateLimitType.USER, user_id))
+            scopes.append("user")
+        if ip_scoped:
+            windows.append((RateLimitType.IP, self._get_client_ip(context.request)))
+            scopes.append("IP")
+        if user_scoped:
+            # Nested token buckets: the user's (burst_limit tokens) under the agent's
+            # (a minute's worth of requests for the whole agent)
+            buckets = [
+                (RateLimitType.USER, user_id, None),
+                (RateLimitType.AGENT, self._agent_id, config.requests_per_minute),
+            ]
+            scopes += ("user", "agent")
         
-        if not user_result.allowed:
-            raise HTTPException(
-                status_code=429,
-                detail=f"Rate limit exceeded for user. Retry after {user_result.retry_after} seconds",
-                headers={
-                    "X-RateLimit-Limit": str(self.config.rate_limit_config.requests_per_minute),
-                    "X-RateLimit-Remaining": str(user_result.remaining),
-                    "X-RateLimit-Reset": str(user_result.reset_time),
-                    "Retry-After": str(user_result.retry_after or 60)
-                }
-            )
-        
-        # Check IP rate limit
-        ip_result = await rate_limiter.check_rate_limit(
-            RateLimitType.IP,
-            client_ip,
-            self.config.rate_limit_config
+        # One atomic backend call. Nothing is charged unless every window and bucket
+        # allows the request, so a user over their own limit never drains the bucket
+        # everyone else shares. Large prompts cost more than one bucket token.
+        results = await rate_limiter.check_request_limits(
+            windows,
+            buckets,
+            config,
+            cost=self._estimate_request_cost(context) if buckets else 1
         )
         
-        if not ip_result.allowed:
-            raise HTTPException(
-                status_code=429,
-                detail=f"Rate limit exceeded for IP. Retry after {ip_result.retry_after} seconds",
-                headers={
-                    "X-RateLimit-Limit": str(self.config.rate_limit_config.requests_per_minute),
-                    "X-RateLimit-Remaining": str(ip_result.remaining),
-                    "X-RateLimit-Reset": str(ip_result.reset_time),
-                    "Retry-After": str(ip_result.retry_after or 60)
-                }
-            )
-        
-        # Check agent-specific rate limit
-        agent_id = self.config.route.replace("/agents/", "")
-        agent_result = await rate_limiter.check_rate_limit(
-            RateLimitType.AGENT,
-            agent_id,
-            self.config.rate_limit_config
+        for scope, result in zip(scopes, results):
+            if not result.allowed:
+                self._raise_rate_limited(scope, result)
+    
+    def _raise_rate_limited(self, scope: str, result) -> None:
+        """Raise a 429 with X-RateLimit headers for a denied rate limit check"""
+        retry_after = result.retry_after or 60
+        raise HTTPException(
+            status_code=429,
+            detail=f"Rate limit exceeded for {scope}. Retry after {retry_after} seconds",
+            headers={
+                "X-RateLimit-Limit": self._rl_limit_str,
+                "X-RateLimit-Remaining": str(result.remaining),
+                "X-RateLimit-Reset": str(result.reset_time),
+                "Retry-After": str(retry_after)
+            }
         )
-        
-        if not agent_result.allowed:
-            raise HTTPException(
-                status_code=429,
-                detail=f"Rate limit exceeded for agent. Retry after {agent_result.retry_after} seconds",
-                headers={
-                    "X-RateLimit-Limit": str(self.config.rate_limit_config.requests_per_minute),
-                    "X-RateLimit-Remaining": str(agent_result.remaining),
-                    "X-RateLimit-Reset": str(agent_result.reset_time),
-                    "Retry-After": str(agent_result.retry_after or 60)
-                }
-            )
+    
+    def _estimate_request_cost(self, context: AgentRequestContext) -> float:
+        """Estimate how many bucket tokens a request costs from its prompt size"""
+        # Roughly 4 characters per LLM token
+        chars = sum(len(getattr(m, 'content', None) or '') for m in context.input_data.messages or [])
+        tokens_per_request = self.config.rate_limit_config.tokens_per_request or 1
+        return max(1, math.ceil((chars / 4) / tokens_per_request))
     
     def _get_client_ip(self, request: Request) -> str:
         """Get client IP address from request"""
-        # Check for forwarded headers first
-        forwarded_for = request.headers.get("X-Forwarded-For")
+        headers = request.headers
+        
+        # Check for forwarded headers first; only the first hop is needed
+        forwarded_for = headers.get(FORWARDED_FOR_HEADER)
         if forwarded_for:
-            return forwarded_for.split(",")[0].strip()
+            return forwarded_for.partition(",")[0].strip()
         
-        real_ip = request.headers.get("X-Real-IP")
+        real_ip = headers.get(REAL_IP_HEADER)
         if real_ip:
             return real_ip
         
@@ -946,25 +1298,39 @@ class AgentRegistry:
         """Get all registered agent routes"""
         return list(self.agents.keys())
     
-    def get_system_health(self) -> Dict[str, Any]:
+    async def get_system_health(self) -> Dict[str, Any]:
         """Get overall system health status"""
         agents_health = {}
         total_agents = len(self.agents)
         healthy_agents = 0
         
-        for route, handler in self.agents.items():
-            try:
-                agent_health = handler.get_health_status()
-                agents_health[route] = agent_health
-                if agent_health.get("status") == "active":
-                    healthy_agents += 1
-            except Exception as e:
+        # Probe all agents concurrently so one slow agent can't stall the whole check
+        routes = list(self.agents.keys())
+        results = await asyncio.gather(
+            *[
+                asyncio.wait_for(handler.get_health_status(), timeout=HEALTH_PROBE_TIMEOUT)
+                for handler in self.agents.values()
+            ],
+            return_exceptions=True
+        )
+        
+        for route, result in zip(routes, results):
+            if isinstance(result, BaseException):
+                if isinstance(result, asyncio.TimeoutError):
+                    error = f"Health probe timed out after {HEALTH_PROBE_TIMEOUT}s"
+                else:
+                    error = str(result)
                 agents_health[route] = {
                     "agent_id": route.lstrip('/'),
                     "status": "unhealthy",
-                    "error": str(e),
+                    "error": error,
                     "timestamp": self._get_current_timestamp()
                 }
+                continue
+            
+            agents_health[route] = result
+            if result.get("status") == "active":
+                healthy_agents += 1
         
         # Calculate overall system health
         system_status = "healthy" if healthy_agents == total_agents else "degraded"
@@ -983,7 +1349,6 @@ class AgentRegistry:
     
     def _get_current_timestamp(self) -> str:
         """Get current timestamp in ISO format"""
-        from datetime import datetime
         return datetime.utcnow().isoformat()
     
     def _get_system_uptime(self) -> Optional[float]:
@@ -997,12 +1362,9 @@ class AgentRegistry:
         for route, handler in self.agents.items():
             config = self.configs[route]
             
-            # Create endpoint function with proper closure
-            async def create_endpoint(request: Request, input_data: RunAgentInput, handler_ref=handler):
-                return await handler_ref.handle_request(request, input_data)
-            
-            # Register the route
-            app.post(route, description=config.description)(create_endpoint)
+            # Register the handler's bound method directly; FastAPI reads the
+            # (request, input_data) signature from it, no trampoline needed
+            app.post(route, description=config.description)(handler.handle_request)
             logger.info(f"🔗 Setup FastAPI route: {route}")
 
 
@@ -1,15 +1,51 @@
 # Model Factory for All Agents
 # This module provides a unified interface for different AI models (OpenAI, GROQ, Gemini)
 
-from openai import OpenAI
-from groq import Groq as GroqClient
-import google.generativeai as genai
-from typing import Dict, Any, List, Optional, Union
+# Provider SDKs are imported on first use so deployments only pay the import
+# cost (google.generativeai pulls in gRPC/protobuf) for providers they call.
+# Environment variables are loaded by the application entrypoint.
+
+from typing import TYPE_CHECKING, Dict, Any, List, Optional, Union
+import functools
 import os
 import uuid
-from dotenv import load_dotenv
 
-load_dotenv()
+if TYPE_CHECKING:
+    from openai import AsyncOpenAI
+    from groq import AsyncGroq as GroqClient
+
+
+@functools.lru_cache(maxsize=None)
+def _shared_http_client():
+    """One httpx pool shared by every provider client for keepalive/TLS session reuse"""
+    import httpx
+    try:
+        import h2  # noqa: F401 - HTTP/2 multiplexes concurrent streams to the same provider
+        http2 = True
+    except ImportError:
+        http2 = False
+    return httpx.AsyncClient(
+        limits=httpx.Limits(max_connections=200, max_keepalive_connections=100),
+        http2=http2,
+        timeout=httpx.Timeout(60.0, connect=5.0),
+    )
+
+
+@functools.lru_cache(maxsize=None)
+def _client_for(provider: str, api_key: str) -> Union["AsyncOpenAI", "GroqClient", Any]:
+    """Build one client per (provider, API key) and reuse it, keeping its connection pool warm"""
+    if provider == "openai":
+        from openai import AsyncOpenAI
+        return AsyncOpenAI(api_key=api_key, http_client=_shared_http_client())
+    elif provider == "groq":
+        from groq import AsyncGroq as GroqClient
+        return GroqClient(api_key=api_key, http_client=_shared_http_client())
+    elif provider == "gemini":
+        import google.generativeai as genai
+        genai.configure(api_key=api_key)
+        return genai
+    raise ValueError(f"Unsupported provider: {provider}")
+
 
 class ModelFactory:
     """Factory class for creating different AI model instances"""
@@ -86,7 +122,7 @@ class ModelFactory:
         return cls.SUPPORTED_MODELS
     
     @classmethod
-    def create_model_client(cls, model_id: str) -> Union[OpenAI, GroqClient, Any]:
+    def create_model_client(cls, model_id: str) -> Union["AsyncOpenAI", "GroqClient", Any]:
         """Create a model client instance for the specified model"""
         if model_id not in cls.SUPPORTED_MODELS:
             raise ValueError(f"Unsupported model: {model_id}. Supported models: {list(cls.SUPPORTED_MODELS.keys())}")
@@ -97,20 +133,19 @@ class ModelFactory:
             api_key = os.getenv("OPENAI_API_KEY")
             if not api_key:
                 raise ValueError("OPENAI_API_KEY environment variable is required for OpenAI models")
-            return OpenAI(api_key=api_key)
+            return _client_for("openai", api_key)
         
         elif model_config["provider"] == "groq":
             api_key = os.getenv("GROQ_API_KEY")
             if not api_key:
                 raise ValueError("GROQ_API_KEY environment variable is required for GROQ models")
-            return GroqClient(api_key=api_key)
+            return _client_for("groq", api_key)
         
         elif model_config["provider"] == "gemini":
             api_key = os.getenv("GOOGLE_API_KEY")
             if not api_key:
                 raise ValueError("GOOGLE_API_KEY environment variable is required for Gemini models")
-            genai.configure(api_key=api_key)
-            return genai
+            return _client_for("gemini", api_key)
         
         raise ValueError(f"Unsupported provider: {model_config['provider']}")
     
@@ -131,16 +166,19 @@ class ModelManager:
     
     def __init__(self, model_id: str):
         """Initialize ModelManager with a specific model"""
-        if not ModelFactory.validate_model_id(model_id):
+        cfg = ModelFactory.SUPPORTED_MODELS.get(model_id)
+        if cfg is None:
             raise ValueError(f"Invalid model ID: {model_id}")
         
         self.model_id = model_id
+        self._cfg = cfg
         self.client = ModelFactory.create_model_client(model_id)
-        self.model_name = ModelFactory.get_model_name(model_id)
-        self.provider = ModelFactory.SUPPORTED_MODELS[model_id]["provider"]
+        self.model_name = cfg["model_name"]
+        self.provider = cfg["provider"]
+        self._gemini_model = None  # Created on first Gemini completion
     
-    def chat_completion(self, messages: List[Dict[str, Any]], tools: Optional[List[Dict[str, Any]]] = None, **kwargs) -> Any:
-        """Create a chat completion using the configured model"""
+    async def chat_completion(self, messages: List[Dict[str, Any]], tools: Optional[List[Dict[str, Any]]] = None, **kwargs) -> Any:
+        """Create a chat completion using the configured model without blocking the event loop"""
         if self.provider == "openai" or self.provider == "groq":
             completion_params = {
                 "model": self.model_name,
@@ -151,39 +189,44 @@ class ModelManager:
             if tools:
                 completion_params["tools"] = tools
             
-            return self.client.chat.completions.create(**completion_params)
+            return await self.client.chat.completions.create(**completion_params)
         
         elif self.provider == "gemini":
             # Convert messages to Gemini format
             gemini_messages = self._convert_to_gemini_format(messages)
-            model = self.client.GenerativeModel(self.model_name)
+            if self._gemini_model is None:
+                self._gemini_model = self.client.GenerativeModel(self.model_name)
+            model = self._gemini_model
             
             # Handle tools for Gemini if provided
             if tools:
                 # Convert tools to Gemini format if needed
                 gemini_tools = self._convert_tools_to_gemini_format(tools)
-                return model.generate_content(gemini_messages, tools=gemini_tools, **kwargs)
+                return await model.generate_content_async(gemini_messages, tools=gemini_tools, **kwargs)
             else:
-                return model.generate_content(gemini_messages, **kwargs)
+                return await model.generate_content_async(gemini_messages, **kwargs)
         
         raise ValueError(f"Unsupported provider for chat completion: {self.provider}")
     
     def _convert_to_gemini_format(self, messages: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         """Convert OpenAI message format to Gemini format"""
         gemini_messages = []
+        # Gemini doesn't have system messages; hold them until the next user
+        # message and prepend them there (single pass, input is not mutated)
+        pending_system = []
         
         for msg in messages:
-            if msg["role"] == "system":
-                # Gemini doesn't have system messages, prepend to user
-                system_content = msg["content"]
-                # Find the first user message to prepend the system content
-                for i, next_msg in enumerate(messages):
-                    if next_msg["role"] == "user":
-                        messages[i]["content"] = f"System: {system_content}\n\nUser: {next_msg['content']}"
-                        break
-            elif msg["role"] == "user":
-                gemini_messages.append({"role": "user", "parts": [{"text": msg["content"]}]})
-            elif msg["role"] == "assistant":
+            role = msg["role"]
+            if role == "system":
+                pending_system.append(msg["content"])
+            elif role == "user":
+                content = msg["content"]
+                if pending_system:
+                    system_content = "\n".join(pending_system)
+                    content = f"System: {system_content}\n\nUser: {content}"
+                    pending_system.clear()
+                gemini_messages.append({"role": "user", "parts": [{"text": content}]})
+            elif role == "assistant":
                 gemini_messages.append({"role": "model", "parts": [{"text": msg["content"]}]})
         
         return gemini_messages
@@ -208,9 +251,4 @@ class ModelManager:
     
     def get_model_info(self) -> Dict[str, str]:
         """Get information about the current model"""
-        return {
-            "model_id": self.model_id,
-            "model_name": self.model_name,
-            "description": ModelFactory.SUPPORTED_MODELS[self.model_id]["description"],
-            "provider": ModelFactory.SUPPORTED_MODELS[self.model_id]["provider"]
-        }
+        return {"model_id": self.model_id, **self._cfg}
@@ -11,13 +11,15 @@ Comprehensive rate limiting implementation with support for:
 - Circuit breaker patterns
 """
 
+import math
+import sys
 import time
 import logging
-from typing import Dict, Optional, Tuple, Any
+from typing import Dict, List, Optional, Tuple, Any
 from dataclasses import dataclass
 from enum import Enum
 import asyncio
-from datetime import datetime, timedelta
+from collections import OrderedDict
 
 logger = logging.getLogger(__name__)
 
@@ -30,7 +32,21 @@ class RateLimitType(Enum):
     IP = "ip"
 
 
-@dataclass
+# One-character codes keep the high-volume Redis keys short; logs and status keep .value
+_KEY_CODES = {
+    RateLimitType.USER: "u",
+    RateLimitType.AGENT: "a",
+    RateLimitType.GLOBAL: "g",
+    RateLimitType.IP: "i",
+}
+
+# Interned key prefixes per limit type, so hot paths only append the limit value
+_REDIS_PREFIXES = {t: sys.intern(f"rate_limit:{_KEY_CODES[t]}:") for t in RateLimitType}
+_BUCKET_PREFIXES = {t: sys.intern(f"token_bucket:{_KEY_CODES[t]}:") for t in RateLimitType}
+_MEMORY_PREFIXES = {t: sys.intern(f"{t.value}:") for t in RateLimitType}
+
+
+@dataclass(slots=True, frozen=True)
 class RateLimitConfig:
     """Configuration for rate limiting"""
     requests_per_minute: int = 60
@@ -39,9 +55,10 @@ class RateLimitConfig:
     burst_limit: int = 10  # Max requests in a short burst
     window_size: int = 60  # Window size in seconds
     enabled: bool = True
+    tokens_per_request: int = 4000  # Estimated LLM tokens covered by one bucket token
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class RateLimitResult:
     """Result of a rate limit check"""
     allowed: bool
@@ -52,14 +69,256 @@ class RateLimitResult:
     limit_value: Optional[str] = None
 
 
+# (name, size in seconds) for each enforced window
+_WINDOWS = (("minute", 60), ("hour", 3600), ("day", 86400))
+
+# Max (limit_type, limit_value) pairs whose Redis key prefixes are cached
+_KEY_CACHE_SIZE = 4096
+# Max keys tracked by the in-memory backend before least recently used ones are dropped
+_MEMORY_STORE_SIZE = 100_000
+_CIRCUIT_BREAKER_STORE_SIZE = 10_000
+
+
+class _LRUStore(OrderedDict):
+    """Dict that evicts its least recently used entries beyond `maxsize`"""
+    
+    def __init__(self, maxsize: int):
+        super().__init__()
+        self.maxsize = maxsize
+    
+    def get(self, key, default=None):
+        if key in self:
+            self.move_to_end(key)
+            return self[key]
+        return default
+    
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        self.move_to_end(key)
+        if len(self) > self.maxsize:
+            self.popitem(last=False)
+
+
+def _sliding_count(current: int, previous: int, now: float, window_size: int) -> float:
+    """Estimate requests in the trailing window from current and previous bucket counts"""
+    elapsed_fraction = (now % window_size) / window_size
+    return current + previous * (1 - elapsed_fraction)
+
+
+# Check-then-increment sliding-window counters for every (spec, window) pair in one
+# atomic call. A spec's buckets are only incremented if none of its windows would go
+# over its limit, so rejected requests don't keep inflating the counters.
+# KEYS = current, previous bucket key per pair
+# ARGV[1] = windows per spec, then (ttl, limit, previous-bucket weight) per pair
+# Returns flat {current including this request, previous} counts in KEYS order.
+SLIDING_WINDOW_LUA = """
+local per_spec = tonumber(ARGV[1])
+local values = redis.call('MGET', unpack(KEYS))
+local counts = {}
+local pairs_total = #KEYS / 2
+for first = 1, pairs_total, per_spec do
+    local over = false
+    for p = first, first + per_spec - 1 do
+        local current = tonumber(values[2 * p - 1] or 0) + 1
+        local previous = tonumber(values[2 * p] or 0)
+        counts[2 * p - 1] = current
+        counts[2 * p] = previous
+        if current + previous * tonumber(ARGV[3 * p + 1]) > tonumber(ARGV[3 * p]) then
+            over = true
+        end
+    end
+    if not over then
+        for p = first, first + per_spec - 1 do
+            if redis.call('INCR', KEYS[2 * p - 1]) == 1 then
+                redis.call('EXPIRE', KEYS[2 * p - 1], ARGV[3 * p - 1])
+            end
+        end
+    end
+end
+return counts
+"""
+
+
+# Atomic refill-then-deduct for nested token buckets stored as Redis hashes. Tokens
+# are only taken if every bucket can cover its cost, so a request denied by one
+# bucket leaves the others untouched.
+# KEYS = bucket keys; ARGV[1] = now, then (capacity, refill_per_sec, cost) per key
+# Returns {allowed, tokens left per key}
+TOKEN_BUCKET_LUA = """
+local now = tonumber(ARGV[1])
+local tokens = {}
+local allowed = 1
+for i = 1, #KEYS do
+    local capacity = tonumber(ARGV[3 * i - 1])
+    local rate = tonumber(ARGV[3 * i])
+    local state = redis.call('HMGET', KEYS[i], 'tokens', 'ts')
+    local t = tonumber(state[1]) or capacity
+    local ts = tonumber(state[2]) or now
+    tokens[i] = math.min(capacity, t + math.max(0, now - ts) * rate)
+    if tokens[i] < tonumber(ARGV[3 * i + 1]) then
+        allowed = 0
+    end
+end
+local reply = {allowed}
+for i = 1, #KEYS do
+    local capacity = tonumber(ARGV[3 * i - 1])
+    local rate = tonumber(ARGV[3 * i])
+    if allowed == 1 then
+        tokens[i] = tokens[i] - tonumber(ARGV[3 * i + 1])
+    end
+    redis.call('HSET', KEYS[i], 'tokens', tostring(tokens[i]), 'ts', tostring(now))
+    redis.call('EXPIRE', KEYS[i], math.ceil(capacity / rate) * 2)
+    reply[i + 1] = tostring(tokens[i])
+end
+return reply
+"""
+
+
+# Sliding windows and nested token buckets for one request in a single atomic call,
+# all or nothing: counters are only incremented and tokens only taken when every
+# window and every bucket allows the request.
+# KEYS = current, previous bucket key per (spec, window) pair, then token bucket keys
+# ARGV[1] = number of pairs, ARGV[2] = now, then (ttl, limit, previous-bucket weight)
+# per pair, then (capacity, refill_per_sec, cost) per token bucket
+# Returns {allowed, current and previous count per pair, tokens left per bucket}
+REQUEST_LIMITS_LUA = """
+local pairs_total = tonumber(ARGV[1])
+local now = tonumber(ARGV[2])
+local window_keys = 2 * pairs_total
+local reply = {}
+local allowed = 1
+if pairs_total > 0 then
+    local values = redis.call('MGET', unpack(KEYS, 1, window_keys))
+    for p = 1, pairs_total do
+        local current = tonumber(values[2 * p - 1] or 0) + 1
+        local previous = tonumber(values[2 * p] or 0)
+        reply[2 * p] = current
+        reply[2 * p + 1] = previous
+        if current + previous * tonumber(ARGV[3 * p + 2]) > tonumber(ARGV[3 * p + 1]) then
+            allowed = 0
+        end
+    end
+end
+local base = 2 + 3 * pairs_total
+local tokens = {}
+for b = 1, #KEYS - window_keys do
+    local capacity = tonumber(ARGV[base + 3 * b - 2])
+    local rate = tonumber(ARGV[base + 3 * b - 1])
+    local state = redis.call('HMGET', KEYS[window_keys + b], 'tokens', 'ts')
+    local t = tonumber(state[1]) or capacity
+    local ts = tonumber(state[2]) or now
+    tokens[b] = math.min(capacity, t + math.max(0, now - ts) * rate)
+    if tokens[b] < tonumber(ARGV[base + 3 * b]) then
+        allowed = 0
+    end
+end
+reply[1] = allowed
+if allowed == 1 then
+    for p = 1, pairs_total do
+        if redis.call('INCR', KEYS[2 * p - 1]) == 1 then
+            redis.call('EXPIRE', KEYS[2 * p - 1], ARGV[3 * p])
+        end
+    end
+end
+for b = 1, #tokens do
+    local capacity = tonumber(ARGV[base + 3 * b - 2])
+    local rate = tonumber(ARGV[base + 3 * b - 1])
+    if allowed == 1 then
+        tokens[b] = tokens[b] - tonumber(ARGV[base + 3 * b])
+    end
+    redis.call('HSET', KEYS[window_keys + b], 'tokens', tostring(tokens[b]), 'ts', tostring(now))
+    redis.call('EXPIRE', KEYS[window_keys + b], math.ceil(capacity / rate) * 2)
+    reply[window_keys + 1 + b] = tostring(tokens[b])
+end
+return reply
+"""
+
+
+@dataclass(slots=True)
+class BucketState:
+    """In-memory sliding-window counters, one slot per entry in _WINDOWS"""
+    epochs: List[int]
+    current: List[int]
+    previous: List[int]
+    
+    @classmethod
+    def empty(cls) -> "BucketState":
+        n = len(_WINDOWS)
+        return cls([0] * n, [0] * n, [0] * n)
+    
+    def roll(self, now: int) -> None:
+        """Advance every window to the bucket containing `now`"""
+        for j, (_, window_size) in enumerate(_WINDOWS):
+            bucket = now // window_size
+            if self.epochs[j] != bucket:
+                # The old bucket is only "previous" if it is directly adjacent
+                self.previous[j] = self.current[j] if self.epochs[j] == bucket - 1 else 0
+                self.current[j] = 0
+                self.epochs[j] = bucket
+    
+    def counts(self, now: float) -> List[float]:
+        """Sliding-window estimates for each window"""
+        return [
+            _sliding_count(self.current[j], self.previous[j], now, window_size)
+            for j, (_, window_size) in enumerate(_WINDOWS)
+        ]
+
+
+class TokenBucket:
+    """In-memory token bucket: `capacity` tokens of burst, refilled at `refill_per_sec`"""
+    
+    __slots__ = ("capacity", "refill_per_sec", "tokens", "last_refill")
+    
+    def __init__(self, capacity: float, refill_per_sec: float):
+        self.capacity = capacity
+        self.refill_per_sec = refill_per_sec
+        self.tokens = capacity
+        self.last_refill = time.time()
+    
+    def refill(self, now: float) -> None:
+        """Add the tokens earned since the last refill, up to capacity"""
+        elapsed = max(0.0, now - self.last_refill)
+        self.tokens = min(self.capacity, self.tokens + elapsed * self.refill_per_sec)
+        self.last_refill = now
+    
+    def consume(self, cost: float, now: Optional[float] = None) -> bool:
+        """Refill for elapsed time, then take `cost` tokens if available"""
+        self.refill(time.time() if now is None else now)
+        if self.tokens >= cost:
+            self.tokens -= cost
+            return True
+        return False
+
+
 class RateLimiter:
     """Main rate limiter class with Redis and in-memory backends"""
     
     def __init__(self, redis_client=None, fallback_to_memory=True):
         self.redis_client = redis_client
         self.fallback_to_memory = fallback_to_memory
-        self.memory_store = {}  # Fallback in-memory store
-        self.circuit_breakers = {}  # Circuit breaker state
+        self.memory_store = _LRUStore(_MEMORY_STORE_SIZE)  # Fallback in-memory store: key -> BucketState
+        self.token_buckets = _LRUStore(_MEMORY_STORE_SIZE)  # In-memory token buckets
+        self.circuit_breakers = _LRUStore(_CIRCUIT_BREAKER_STORE_SIZE)  # Circuit breaker state
+        self._scripts = {}  # Lua source -> registered Script (EVALSHA with NOSCRIPT fallback)
+        self._key_cache = _LRUStore(_KEY_CACHE_SIZE)  # (limit_type, limit_value) -> per-window key prefixes
+    
+    def _window_prefixes(self, limit_type: RateLimitType, limit_value: str) -> Tuple[str, ...]:
+        """Redis key prefixes for each window; only the bucket number is appended per call"""
+        cache_key = (limit_type, limit_value)
+        prefixes = self._key_cache.get(cache_key)
+        if prefixes is None:
+            base = _REDIS_PREFIXES[limit_type] + limit_value + ":"
+            prefixes = self._key_cache[cache_key] = tuple(
+                f"{base}{window_name}:" for window_name, _ in _WINDOWS
+            )
+        return prefixes
+    
+    def _script(self, source: str):
+        """Registered Script for `source`, created once per limiter"""
+        script = self._scripts.get(source)
+        if script is None:
+            script = self._scripts[source] = self.redis_client.register_script(source)
+        return script
         
     async def check_rate_limit(
         self, 
@@ -69,68 +328,156 @@ class RateLimiter:
     ) -> RateLimitResult:
         """Check if request is within rate limits"""
         
+        # One clock read per check, shared by bucket math and reset times
+        now = time.time()
+        
         if not config.enabled:
             return RateLimitResult(
                 allowed=True,
                 remaining=config.requests_per_minute,
-                reset_time=int(time.time() + config.window_size),
+                reset_time=int(now + config.window_size),
                 limit_type=limit_type,
                 limit_value=limit_value
             )
         
         try:
             if self.redis_client:
-                return await self._check_redis_rate_limit(limit_type, limit_value, config)
+                return await self._check_redis_rate_limit(limit_type, limit_value, config, now)
             else:
-                return await self._check_memory_rate_limit(limit_type, limit_value, config)
+                return self._check_memory_rate_limit(limit_type, limit_value, config, now)
         except Exception as e:
             logger.error(f"Rate limit check failed: {e}")
             if self.fallback_to_memory:
-                return await self._check_memory_rate_limit(limit_type, limit_value, config)
+                return self._check_memory_rate_limit(limit_type, limit_value, config, now)
             else:
                 # Fail open - allow request if rate limiting fails
                 return RateLimitResult(
                     allowed=True,
                     remaining=config.requests_per_minute,
-                    reset_time=int(time.time() + config.window_size),
+                    reset_time=int(now + config.window_size),
+                    limit_type=limit_type,
+                    limit_value=limit_value
+                )
+    
+    async def check_rate_limits_batch(
+        self,
+        specs: List[Tuple[RateLimitType, str]],
+        config: RateLimitConfig
+    ) -> List[RateLimitResult]:
+        """Check several (limit_type, limit_value) pairs in one backend round trip"""
+        
+        now = time.time()
+        
+        if not config.enabled:
+            return [
+                RateLimitResult(
+                    allowed=True,
+                    remaining=config.requests_per_minute,
+                    reset_time=int(now + config.window_size),
                     limit_type=limit_type,
                     limit_value=limit_value
                 )
+                for limit_type, limit_value in specs
+            ]
+        
+        try:
+            if self.redis_client:
+                return await self._check_redis_rate_limits_batch(specs, config, now)
+            else:
+                return [
+                    self._check_memory_rate_limit(limit_type, limit_value, config, now)
+                    for limit_type, limit_value in specs
+                ]
+        except Exception as e:
+            logger.error(f"Batch rate limit check failed: {e}")
+            if self.fallback_to_memory:
+                return [
+                    self._check_memory_rate_limit(limit_type, limit_value, config, now)
+                    for limit_type, limit_value in specs
+                ]
+            else:
+                # Fail open - allow request if rate limiting fails
+                return [
+                    RateLimitResult(
+                        allowed=True,
+                        remaining=config.requests_per_minute,
+                        reset_time=int(now + config.window_size),
+                        limit_type=limit_type,
+                        limit_value=limit_value
+                    )
+                    for limit_type, limit_value in specs
+                ]
     
     async def _check_redis_rate_limit(
         self, 
         limit_type: RateLimitType, 
         limit_value: str, 
-        config: RateLimitConfig
+        config: RateLimitConfig,
+        now_f: float
     ) -> RateLimitResult:
         """Check rate limit using Redis backend"""
+        results = await self._check_redis_rate_limits_batch([(limit_type, limit_value)], config, now_f)
+        return results[0]
+    
+    async def _check_redis_rate_limits_batch(
+        self,
+        specs: List[Tuple[RateLimitType, str]],
+        config: RateLimitConfig,
+        now_f: float
+    ) -> List[RateLimitResult]:
+        """Check rate limits for several keys with a single Lua script call
         
-        # Create Redis keys for different time windows
-        now = int(time.time())
-        minute_key = f"rate_limit:{limit_type.value}:{limit_value}:minute:{now // 60}"
-        hour_key = f"rate_limit:{limit_type.value}:{limit_value}:hour:{now // 3600}"
-        day_key = f"rate_limit:{limit_type.value}:{limit_value}:day:{now // 86400}"
-        
-        # Use Redis pipeline for atomic operations
-        pipe = self.redis_client.pipeline()
-        
-        # Check minute limit
-        pipe.incr(minute_key)
-        pipe.expire(minute_key, 60)
+        Each window uses a sliding-window counter: the current bucket's count plus
+        the previous bucket's count weighted by how much of it still overlaps the
+        window. This avoids the 2x burst fixed windows allow at bucket boundaries
+        while keeping two integer counters per window.
+        """
         
-        # Check hour limit
-        pipe.incr(hour_key)
-        pipe.expire(hour_key, 3600)
+        now = int(now_f)
         
-        # Check day limit
-        pipe.incr(day_key)
-        pipe.expire(day_key, 86400)
+        limits = (config.requests_per_minute, config.requests_per_hour, config.requests_per_day)
+        keys = []
+        args = [len(_WINDOWS)]
+        for limit_type, limit_value in specs:
+            prefixes = self._window_prefixes(limit_type, limit_value)
+            for base, (_, window_size), limit in zip(prefixes, _WINDOWS, limits):
+                bucket = now // window_size
+                keys.append(base + str(bucket))
+                keys.append(base + str(bucket - 1))
+                # Buckets must outlive the next window to act as its "previous" count
+                args.append(window_size * 2)
+                args.append(limit)
+                args.append(1 - (now_f % window_size) / window_size)
         
-        results = await pipe.execute()
+        # Script runs atomically, so no other client interleaves between the check
+        # and the increment
+        results = await self._script(SLIDING_WINDOW_LUA)(keys=keys, args=args)
         
-        minute_count = results[0]
-        hour_count = results[2]
-        day_count = results[4]
+        # Two replies (current, previous) per window, three windows per spec
+        evaluated = []
+        per_spec = 2 * len(_WINDOWS)
+        for i, (limit_type, limit_value) in enumerate(specs):
+            offset = i * per_spec
+            counts = [
+                _sliding_count(int(results[offset + j * 2]), int(results[offset + j * 2 + 1]), now_f, window_size)
+                for j, (_, window_size) in enumerate(_WINDOWS)
+            ]
+            evaluated.append(
+                self._evaluate_counts(limit_type, limit_value, config, now, *counts)
+            )
+        return evaluated
+    
+    def _evaluate_counts(
+        self,
+        limit_type: RateLimitType,
+        limit_value: str,
+        config: RateLimitConfig,
+        now: int,
+        minute_count: float,
+        hour_count: float,
+        day_count: float
+    ) -> RateLimitResult:
+        """Turn minute/hour/day counters into a RateLimitResult"""
         
         # Check limits
         if (minute_count > config.requests_per_minute or 
@@ -162,58 +509,349 @@ class RateLimiter:
         
         return RateLimitResult(
             allowed=True,
-            remaining=max(0, remaining),
+            remaining=max(0, int(remaining)),
             reset_time=now + 60,  # Reset in 1 minute
             limit_type=limit_type,
             limit_value=limit_value
         )
     
-    async def _check_memory_rate_limit(
+    def _check_memory_rate_limit(
         self, 
         limit_type: RateLimitType, 
         limit_value: str, 
-        config: RateLimitConfig
+        config: RateLimitConfig,
+        now_f: float
     ) -> RateLimitResult:
         """Check rate limit using in-memory store (fallback)"""
         
+        now = int(now_f)
+        key = _MEMORY_PREFIXES[limit_type] + limit_value
+        state = self.memory_store.get(key)
+        if state is None:
+            state = self.memory_store[key] = BucketState.empty()
+        
+        # Same counters and sliding estimate as the Redis path, so both backends
+        # enforce the minute, hour and day limits identically
+        state.roll(now)
+        for j in range(len(_WINDOWS)):
+            state.current[j] += 1
+        
+        result = self._evaluate_counts(limit_type, limit_value, config, now, *state.counts(now_f))
+        if not result.allowed:
+            # Rejected requests don't count against the window
+            for j in range(len(_WINDOWS)):
+                state.current[j] -= 1
+        return result
+    
+    async def check_token_bucket(
+        self,
+        limit_type: RateLimitType,
+        limit_value: str,
+        config: RateLimitConfig,
+        cost: float = 1,
+        capacity: Optional[float] = None
+    ) -> RateLimitResult:
+        """Take `cost` tokens from a bucket holding `capacity` (default `burst_limit`) tokens, refilled at requests_per_minute"""
+        results = await self.check_token_buckets([(limit_type, limit_value, capacity)], config, cost)
+        return results[0]
+    
+    async def check_token_buckets(
+        self,
+        buckets: List[Tuple[RateLimitType, str, Optional[float]]],
+        config: RateLimitConfig,
+        cost: float = 1
+    ) -> List[RateLimitResult]:
+        """Take `cost` tokens from each of several nested buckets, all or nothing
+        
+        Each entry is (limit_type, limit_value, capacity), with capacity None meaning
+        burst_limit; every bucket refills at requests_per_minute. Nothing is taken
+        unless every bucket can cover the request, so a request denied by a child
+        bucket (a user's) doesn't drain its parent (the agent's).
+        """
+        
+        refill_per_sec = config.requests_per_minute / 60.0
         now = time.time()
-        key = f"{limit_type.value}:{limit_value}"
         
-        if key not in self.memory_store:
-            self.memory_store[key] = []
+        # (limit_type, limit_value, capacity, cost); a single request can never cost
+        # more than a full bucket
+        specs = []
+        for limit_type, limit_value, capacity in buckets:
+            capacity = float(config.burst_limit if capacity is None else capacity)
+            specs.append((limit_type, limit_value, capacity, min(max(cost, 1), capacity)))
         
-        # Clean old entries
-        cutoff_time = now - config.window_size
-        self.memory_store[key] = [
-            timestamp for timestamp in self.memory_store[key] 
-            if timestamp > cutoff_time
-        ]
+        if not config.enabled or refill_per_sec <= 0 or any(spec[2] <= 0 for spec in specs):
+            return [
+                RateLimitResult(
+                    allowed=True,
+                    remaining=int(capacity),
+                    reset_time=int(now),
+                    limit_type=limit_type,
+                    limit_value=limit_value
+                )
+                for limit_type, limit_value, capacity, _ in specs
+            ]
+        
+        try:
+            if self.redis_client:
+                keys = [_BUCKET_PREFIXES[limit_type] + limit_value for limit_type, limit_value, _, _ in specs]
+                args = [now]
+                for _, _, capacity, spec_cost in specs:
+                    args += (capacity, refill_per_sec, spec_cost)
+                reply = await self._script(TOKEN_BUCKET_LUA)(keys=keys, args=args)
+                allowed = bool(int(reply[0]))
+                tokens = [float(t) for t in reply[1:]]
+            else:
+                allowed, tokens = self._consume_memory_buckets(specs, refill_per_sec, now)
+        except Exception as e:
+            logger.error(f"Token bucket check failed: {e}")
+            if not self.fallback_to_memory:
+                # Fail open - allow request if rate limiting fails
+                return [
+                    RateLimitResult(
+                        allowed=True,
+                        remaining=int(capacity),
+                        reset_time=int(now),
+                        limit_type=limit_type,
+                        limit_value=limit_value
+                    )
+                    for limit_type, limit_value, capacity, _ in specs
+                ]
+            allowed, tokens = self._consume_memory_buckets(specs, refill_per_sec, now)
         
-        # Check if limit exceeded
-        if len(self.memory_store[key]) >= config.requests_per_minute:
+        return [
+            # When the request is denied, each bucket reports whether it alone could have covered it
+            self._bucket_result(
+                limit_type, limit_value, allowed or left >= spec_cost, left, capacity, spec_cost, refill_per_sec, now
+            )
+            for (limit_type, limit_value, capacity, spec_cost), left in zip(specs, tokens)
+        ]
+    
+    def _bucket_result(
+        self,
+        limit_type: RateLimitType,
+        limit_value: str,
+        allowed: bool,
+        tokens: float,
+        capacity: float,
+        cost: float,
+        refill_per_sec: float,
+        now: float
+    ) -> RateLimitResult:
+        """Turn a bucket's token count into a RateLimitResult"""
+        if allowed:
             return RateLimitResult(
-                allowed=False,
-                remaining=0,
-                reset_time=int(now + config.window_size),
-                retry_after=config.window_size,
+                allowed=True,
+                remaining=int(tokens),
+                reset_time=int(now + (capacity - tokens) / refill_per_sec),
                 limit_type=limit_type,
                 limit_value=limit_value
             )
         
-        # Add current request
-        self.memory_store[key].append(now)
-        
-        # Calculate remaining
-        remaining = config.requests_per_minute - len(self.memory_store[key])
-        
+        retry_after = max(1, math.ceil((cost - tokens) / refill_per_sec))
         return RateLimitResult(
-            allowed=True,
-            remaining=max(0, remaining),
-            reset_time=int(now + config.window_size),
+            allowed=False,
+            remaining=0,
+            reset_time=int(now) + retry_after,
+            retry_after=retry_after,
             limit_type=limit_type,
             limit_value=limit_value
         )
     
+    def _consume_memory_buckets(
+        self,
+        specs: List[Tuple[RateLimitType, str, float, float]],
+        refill_per_sec: float,
+        now: float
+    ) -> Tuple[bool, List[float]]:
+        """In-memory counterpart of TOKEN_BUCKET_LUA"""
+        buckets = self._refilled_memory_buckets(specs, refill_per_sec, now)
+        allowed = all(bucket.tokens >= spec[3] for bucket, spec in zip(buckets, specs))
+        if allowed:
+            for bucket, spec in zip(buckets, specs):
+                bucket.tokens -= spec[3]
+        return allowed, [bucket.tokens for bucket in buckets]
+    
+    def _refilled_memory_buckets(
+        self,
+        specs: List[Tuple[RateLimitType, str, float, float]],
+        refill_per_sec: float,
+        now: float
+    ) -> List[TokenBucket]:
+        """In-memory token buckets for `specs`, created on first use and refilled to `now`"""
+        buckets = []
+        for limit_type, limit_value, capacity, _ in specs:
+            key = _MEMORY_PREFIXES[limit_type] + limit_value
+            bucket = self.token_buckets.get(key)
+            if bucket is None:
+                bucket = self.token_buckets[key] = TokenBucket(capacity, refill_per_sec)
+            bucket.refill(now)
+            buckets.append(bucket)
+        return buckets
+    
+    async def check_request_limits(
+        self,
+        windows: List[Tuple[RateLimitType, str]],
+        buckets: List[Tuple[RateLimitType, str, Optional[float]]],
+        config: RateLimitConfig,
+        cost: float = 1
+    ) -> List[RateLimitResult]:
+        """Check sliding windows and nested token buckets for one request in one round trip
+        
+        `windows` are (limit_type, limit_value) pairs as for check_rate_limits_batch and
+        `buckets` are (limit_type, limit_value, capacity) as for check_token_buckets.
+        All or nothing: no window is incremented and no bucket charged unless every
+        one of them allows the request. Returns one result per window, then one per bucket.
+        """
+        
+        now = time.time()
+        refill_per_sec = config.requests_per_minute / 60.0
+        specs = []
+        for limit_type, limit_value, capacity in buckets:
+            capacity = float(config.burst_limit if capacity is None else capacity)
+            specs.append((limit_type, limit_value, capacity, min(max(cost, 1), capacity)))
+        
+        if not config.enabled:
+            return self._open_results(windows, specs, config, now)
+        if refill_per_sec <= 0 or any(spec[2] <= 0 for spec in specs):
+            # Token buckets are off for this config; still enforce the windows
+            return (
+                await self.check_rate_limits_batch(windows, config)
+                + self._open_results([], specs, config, now)
+            )
+        
+        try:
+            if self.redis_client:
+                return await self._check_redis_request_limits(windows, specs, config, refill_per_sec, now)
+            return self._check_memory_request_limits(windows, specs, config, refill_per_sec, now)
+        except Exception as e:
+            logger.error(f"Request rate limit check failed: {e}")
+            if self.fallback_to_memory:
+                return self._check_memory_request_limits(windows, specs, config, refill_per_sec, now)
+            # Fail open - allow request if rate limiting fails
+            return self._open_results(windows, specs, config, now)
+    
+    def _open_results(
+        self,
+        windows: List[Tuple[RateLimitType, str]],
+        specs: List[Tuple[RateLimitType, str, float, float]],
+        config: RateLimitConfig,
+        now: float
+    ) -> List[RateLimitResult]:
+        """Allowing results for every window and bucket, used when limits don't apply"""
+        results = [
+            RateLimitResult(
+                allowed=True,
+                remaining=config.requests_per_minute,
+                reset_time=int(now + config.window_size),
+                limit_type=limit_type,
+                limit_value=limit_value
+            )
+            for limit_type, limit_value in windows
+        ]
+        results += [
+            RateLimitResult(
+                allowed=True,
+                remaining=int(capacity),
+                reset_time=int(now),
+                limit_type=limit_type,
+                limit_value=limit_value
+            )
+            for limit_type, limit_value, capacity, _ in specs
+        ]
+        return results
+    
+    async def _check_redis_request_limits(
+        self,
+        windows: List[Tuple[RateLimitType, str]],
+        specs: List[Tuple[RateLimitType, str, float, float]],
+        config: RateLimitConfig,
+        refill_per_sec: float,
+        now_f: float
+    ) -> List[RateLimitResult]:
+        """Check windows and buckets with a single REQUEST_LIMITS_LUA call"""
+        
+        now = int(now_f)
+        
+        limits = (config.requests_per_minute, config.requests_per_hour, config.requests_per_day)
+        keys = []
+        args = [len(windows) * len(_WINDOWS), now_f]
+        for limit_type, limit_value in windows:
+            prefixes = self._window_prefixes(limit_type, limit_value)
+            for base, (_, window_size), limit in zip(prefixes, _WINDOWS, limits):
+                bucket = now // window_size
+                keys.append(base + str(bucket))
+                keys.append(base + str(bucket - 1))
+                args.append(window_size * 2)
+                args.append(limit)
+                args.append(1 - (now_f % window_size) / window_size)
+        for limit_type, limit_value, capacity, spec_cost in specs:
+            keys.append(_BUCKET_PREFIXES[limit_type] + limit_value)
+            args += (capacity, refill_per_sec, spec_cost)
+        
+        reply = await self._script(REQUEST_LIMITS_LUA)(keys=keys, args=args)
+        allowed = bool(int(reply[0]))
+        
+        # Two counts (current, previous) per window, three windows per spec, then
+        # one token count per bucket
+        results = []
+        per_spec = 2 * len(_WINDOWS)
+        for i, (limit_type, limit_value) in enumerate(windows):
+            offset = 1 + i * per_spec
+            counts = [
+                _sliding_count(int(reply[offset + j * 2]), int(reply[offset + j * 2 + 1]), now_f, window_size)
+                for j, (_, window_size) in enumerate(_WINDOWS)
+            ]
+            results.append(self._evaluate_counts(limit_type, limit_value, config, now, *counts))
+        offset = 1 + len(windows) * per_spec
+        for (limit_type, limit_value, capacity, spec_cost), left in zip(specs, reply[offset:]):
+            left = float(left)
+            results.append(self._bucket_result(
+                limit_type, limit_value, allowed or left >= spec_cost, left, capacity, spec_cost, refill_per_sec, now_f
+            ))
+        return results
+    
+    def _check_memory_request_limits(
+        self,
+        windows: List[Tuple[RateLimitType, str]],
+        specs: List[Tuple[RateLimitType, str, float, float]],
+        config: RateLimitConfig,
+        refill_per_sec: float,
+        now_f: float
+    ) -> List[RateLimitResult]:
+        """In-memory counterpart of REQUEST_LIMITS_LUA"""
+        
+        now = int(now_f)
+        states = []
+        results = []
+        for limit_type, limit_value in windows:
+            key = _MEMORY_PREFIXES[limit_type] + limit_value
+            state = self.memory_store.get(key)
+            if state is None:
+                state = self.memory_store[key] = BucketState.empty()
+            state.roll(now)
+            states.append(state)
+            # Counts as if this request were already recorded, like the Lua script
+            counts = [count + 1 for count in state.counts(now_f)]
+            results.append(self._evaluate_counts(limit_type, limit_value, config, now, *counts))
+        
+        buckets = self._refilled_memory_buckets(specs, refill_per_sec, now_f)
+        allowed = all(result.allowed for result in results) and all(
+            bucket.tokens >= spec[3] for bucket, spec in zip(buckets, specs)
+        )
+        if allowed:
+            for state in states:
+                for j in range(len(_WINDOWS)):
+                    state.current[j] += 1
+            for bucket, spec in zip(buckets, specs):
+                bucket.tokens -= spec[3]
+        
+        for bucket, (limit_type, limit_value, capacity, spec_cost) in zip(buckets, specs):
+            results.append(self._bucket_result(
+                limit_type, limit_value, allowed or bucket.tokens >= spec_cost,
+                bucket.tokens, capacity, spec_cost, refill_per_sec, now_f
+            ))
+        return results
+    
     async def get_rate_limit_status(
         self, 
         limit_type: RateLimitType, 
@@ -226,7 +864,7 @@ class RateLimiter:
             if self.redis_client:
                 return await self._get_redis_status(limit_type, limit_value, config)
             else:
-                return await self._get_memory_status(limit_type, limit_value, config)
+                return self._get_memory_status(limit_type, limit_value, config)
         except Exception as e:
             logger.error(f"Rate limit status check failed: {e}")
             return {
@@ -242,22 +880,52 @@ class RateLimiter:
     ) -> Dict[str, Any]:
         """Get rate limit status from Redis"""
         
-        now = int(time.time())
-        minute_key = f"rate_limit:{limit_type.value}:{limit_value}:minute:{now // 60}"
-        hour_key = f"rate_limit:{limit_type.value}:{limit_value}:hour:{now // 3600}"
-        day_key = f"rate_limit:{limit_type.value}:{limit_value}:day:{now // 86400}"
+        now_f = time.time()
+        now = int(now_f)
+        
+        keys = []
+        prefixes = self._window_prefixes(limit_type, limit_value)
+        for base, (_, window_size) in zip(prefixes, _WINDOWS):
+            bucket = now // window_size
+            keys.append(base + str(bucket))
+            keys.append(base + str(bucket - 1))
         
-        pipe = self.redis_client.pipeline()
-        pipe.get(minute_key)
-        pipe.get(hour_key)
-        pipe.get(day_key)
+        results = await self.redis_client.mget(keys)
         
-        results = await pipe.execute()
+        counts = [
+            _sliding_count(int(results[j * 2] or 0), int(results[j * 2 + 1] or 0), now_f, window_size)
+            for j, (_, window_size) in enumerate(_WINDOWS)
+        ]
+        return self._status_dict(limit_type, limit_value, config, counts)
+    
+    def _get_memory_status(
+        self, 
+        limit_type: RateLimitType, 
+        limit_value: str, 
+        config: RateLimitConfig
+    ) -> Dict[str, Any]:
+        """Get rate limit status from memory store"""
         
-        minute_count = int(results[0] or 0)
-        hour_count = int(results[1] or 0)
-        day_count = int(results[2] or 0)
+        now_f = time.time()
+        key = _MEMORY_PREFIXES[limit_type] + limit_value
         
+        state = self.memory_store.get(key)
+        if state is None:
+            counts = [0] * len(_WINDOWS)
+        else:
+            state.roll(int(now_f))
+            counts = state.counts(now_f)
+        return self._status_dict(limit_type, limit_value, config, counts)
+    
+    def _status_dict(
+        self,
+        limit_type: RateLimitType,
+        limit_value: str,
+        config: RateLimitConfig,
+        counts: List[float]
+    ) -> Dict[str, Any]:
+        """Shape minute/hour/day counts into the status payload"""
+        minute_count, hour_count, day_count = (int(c) for c in counts)
         return {
             "minute": {
                 "count": minute_count,
@@ -277,71 +945,50 @@ class RateLimiter:
             "limit_type": limit_type.value,
             "limit_value": limit_value
         }
-    
-    async def _get_memory_status(
-        self, 
-        limit_type: RateLimitType, 
-        limit_value: str, 
-        config: RateLimitConfig
-    ) -> Dict[str, Any]:
-        """Get rate limit status from memory store"""
-        
-        now = time.time()
-        key = f"{limit_type.value}:{limit_value}"
-        
-        if key not in self.memory_store:
-            current_count = 0
-        else:
-            # Clean old entries
-            cutoff_time = now - config.window_size
-            self.memory_store[key] = [
-                timestamp for timestamp in self.memory_store[key] 
-                if timestamp > cutoff_time
-            ]
-            current_count = len(self.memory_store[key])
-        
-        return {
-            "minute": {
-                "count": current_count,
-                "limit": config.requests_per_minute,
-                "remaining": max(0, config.requests_per_minute - current_count)
-            },
-            "limit_type": limit_type.value,
-            "limit_value": limit_value
-        }
 
 
 class CircuitBreaker:
     """Circuit breaker for rate limiting"""
     
+    __slots__ = ("failure_threshold", "recovery_timeout", "failure_count", "_open_until_ns")
+    
     def __init__(self, failure_threshold: int = 5, recovery_timeout: int = 60):
         self.failure_threshold = failure_threshold
         self.recovery_timeout = recovery_timeout
         self.failure_count = 0
-        self.last_failure_time = None
-        self.state = "closed"  # closed, open, half-open
+        self._open_until_ns = 0  # monotonic deadline while open, 0 otherwise
+    
+    @property
+    def state(self) -> str:
+        """closed, open or half-open, derived for introspection"""
+        if self._open_until_ns and time.monotonic_ns() < self._open_until_ns:
+            return "open"
+        if self.failure_count >= self.failure_threshold:
+            return "half-open"
+        return "closed"
     
     def is_open(self) -> bool:
         """Check if circuit breaker is open"""
-        if self.state == "open":
-            if time.time() - self.last_failure_time > self.recovery_timeout:
-                self.state = "half-open"
-                return False
-            return True
-        return False
+        # Closed is the common case: one attribute check, no clock read
+        if not self._open_until_ns:
+            return False
+        if time.monotonic_ns() >= self._open_until_ns:
+            # Recovery timeout elapsed - half-open, let the next request probe
+            self._open_until_ns = 0
+            return False
+        return True
     
     def record_success(self):
         """Record successful request"""
         self.failure_count = 0
-        self.state = "closed"
+        self._open_until_ns = 0
     
     def record_failure(self):
         """Record failed request"""
         self.failure_count += 1
-        self.last_failure_time = time.time()
         
         if self.failure_count >= self.failure_threshold:
-            self.state = "open"
+            self._open_until_ns = time.monotonic_ns() + self.recovery_timeout * 1_000_000_000
 
 
 # Global rate limiter instance
@@ -6,12 +6,43 @@ including local filesystem and cloud object storage (S3, GCS, Azure Blob).
 """
 
 import os
+import re
+import time
 from enum import Enum
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Iterable, List, Tuple, Union
 from pathlib import Path
 import json
 
 
+def _dir_usage(root: str) -> Tuple[int, int]:
+    """Total size in bytes and file count under `root`, walked with os.scandir"""
+    size = 0
+    count = 0
+    stack = [root]
+    while stack:
+        try:
+            with os.scandir(stack.pop()) as entries:
+                for entry in entries:
+                    # DirEntry caches file type and stat, avoiding a Path and a stat() per file
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                    elif entry.is_file():
+                        size += entry.stat().st_size
+                        count += 1
+        except FileNotFoundError:
+            continue
+    return size, count
+
+
+def _extension_regex(extensions: Iterable[str]) -> "re.Pattern[str]":
+    """Match paths whose final extension (as os.path.splitext sees it) is in `extensions`"""
+    names = sorted(re.escape(e.lstrip('.')) for e in extensions)
+    if not names:
+        return re.compile(r"(?!)")
+    # Leading dots of the basename are not an extension, e.g. ".bashrc"
+    return re.compile(r"(?:^|/)\.*[^/.][^/]*\.(?:" + "|".join(names) + r")\Z", re.IGNORECASE)
+
+
 class StorageBackend(Enum):
     """Supported storage backends"""
     LOCAL = "local"
@@ -75,6 +106,8 @@ class StorageConfig:
             # System files
             '.sys', '.drv'
         }
+        
+        self._rebuild_extension_verdicts()
     
     def _default_base_path(self) -> str:
         """Get default base path based on backend"""
@@ -103,18 +136,35 @@ class StorageConfig:
         Returns:
             True if file is allowed, False otherwise
         """
-        path = Path(file_path)
-        ext = path.suffix.lower()
-        
-        # Check blocked extensions
-        if ext in self.blocked_extensions:
-            return False
-        
-        # If allowed extensions is defined, check it
-        if self.allowed_extensions and ext not in self.allowed_extensions:
-            return False
+        ext = os.path.splitext(file_path)[1].lower()
+        return self._ext_verdict.get(ext, self._unlisted_ext_allowed)
+    
+    def _rebuild_extension_verdicts(self):
+        """Fold allowed/blocked extensions into one lookup; call after changing either set"""
+        # Blocked wins over allowed, so it is applied last
+        self._ext_verdict: Dict[str, bool] = dict.fromkeys(self.allowed_extensions, True)
+        self._ext_verdict.update(dict.fromkeys(self.blocked_extensions, False))
+        # Without an allow-list, anything not blocked is allowed
+        self._unlisted_ext_allowed = not self.allowed_extensions
+        self._allowed_re = _extension_regex(self.allowed_extensions)
+        self._blocked_re = _extension_regex(self.blocked_extensions)
+        self._dict_cache: Optional[Dict[str, Any]] = None
+    
+    def validate_files_bulk(self, file_paths: Iterable[str]) -> List[bool]:
+        """
+        Validate many files at once, e.g. entries of an uploaded archive
         
-        return True
+        Args:
+            file_paths: Paths to validate
+            
+        Returns:
+            One verdict per path, same as validate_file
+        """
+        allowed = self._allowed_re.search
+        blocked = self._blocked_re.search
+        if self._unlisted_ext_allowed:
+            return [blocked(p) is None for p in file_paths]
+        return [blocked(p) is None and allowed(p) is not None for p in file_paths]
     
     def check_quota(self, workspace_path: Path, new_file_size: int = 0) -> Dict[str, Any]:
         """
@@ -127,14 +177,7 @@ class StorageConfig:
         Returns:
             Dict with quota status
         """
-        current_size = 0
-        file_count = 0
-        
-        if workspace_path.exists():
-            for file in workspace_path.rglob('*'):
-                if file.is_file():
-                    current_size += file.stat().st_size
-                    file_count += 1
+        current_size, file_count = _dir_usage(str(workspace_path))
         
         current_size_mb = current_size / (1024 * 1024)
         new_file_size_mb = new_file_size / (1024 * 1024)
@@ -188,16 +231,19 @@ class StorageConfig:
     
     def to_dict(self) -> Dict[str, Any]:
         """Convert configuration to dictionary"""
-        return {
-            "backend": self.backend.value,
-            "base_path": self.base_path,
-            "bucket_name": self.bucket_name,
-            "region": self.region,
-            "encryption_enabled": self.encryption_enabled,
-            "quotas": self.quotas,
-            "allowed_extensions": list(self.allowed_extensions),
-            "blocked_extensions": list(self.blocked_extensions)
-        }
+        if self._dict_cache is None:
+            self._dict_cache = {
+                "backend": self.backend.value,
+                "base_path": self.base_path,
+                "bucket_name": self.bucket_name,
+                "region": self.region,
+                "encryption_enabled": self.encryption_enabled,
+                "quotas": self.quotas,
+                "allowed_extensions": sorted(self.allowed_extensions),
+                "blocked_extensions": sorted(self.blocked_extensions)
+            }
+        # Quotas are read live so reassigning them never serves a stale dict
+        return dict(self._dict_cache, quotas=self.quotas)
 
 
 class LifecyclePolicy:
@@ -212,24 +258,27 @@ class LifecyclePolicy:
             "current": -1,  # Keep until workspace deleted (-1 = indefinite)
         }
     
-    def should_delete(self, file_path: Path, category: str) -> bool:
+    def should_delete(
+        self,
+        entry: Union[os.DirEntry, Path, str],
+        category: str,
+        now: Optional[float] = None
+    ) -> bool:
         """
         Check if a file should be deleted based on lifecycle policy
         
         Args:
-            file_path: Path to the file
+            entry: DirEntry from os.scandir (reuses its cached stat) or a path
             category: File category (scratch, runs, artifacts, current)
+            now: Sweep start time; pass once per sweep instead of per file
             
         Returns:
             True if file should be deleted
         """
-        if category not in self.retention_days:
-            return False
-        
-        retention = self.retention_days[category]
+        retention = self.retention_days.get(category)
         
-        # Indefinite retention
-        if retention < 0:
+        # Unknown category or indefinite retention
+        if retention is None or retention < 0:
             return False
         
         # Immediate deletion
@@ -237,13 +286,14 @@ class LifecyclePolicy:
             return True
         
         # Check file age
-        if not file_path.exists():
+        try:
+            mtime = entry.stat().st_mtime if isinstance(entry, os.DirEntry) else os.stat(entry).st_mtime
+        except FileNotFoundError:
             return False
         
-        from datetime import datetime, timedelta
-        file_age = datetime.now() - datetime.fromtimestamp(file_path.stat().st_mtime)
-        
-        return file_age > timedelta(days=retention)
+        if now is None:
+            now = time.time()
+        return now - mtime > retention * 86400
     
     def set_retention(self, category: str, days: int):
         """
@@ -17,15 +17,211 @@ env/{env}/org/{org_id}/workspaces/{scope}/{scope_id}/agent/{agent_id}/ws/{worksp
 
 import os
 import json
-import uuid
+import secrets
 import shutil
-from datetime import datetime
+import time
 from pathlib import Path
 from typing import Optional, Dict, Any, List, Union
 from enum import Enum
 import fcntl
+from functools import singledispatch
+from concurrent.futures import ThreadPoolExecutor
 from contextlib import contextmanager
 
+try:
+    import orjson
+    _ORJSON_OK = True
+except ImportError:
+    orjson = None
+    _ORJSON_OK = False
+
+
+def _dump_json(obj: Any) -> bytes:
+    """Serialize to indented JSON bytes, using orjson when available"""
+    if _ORJSON_OK:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS)
+    return json.dumps(obj, indent=2, default=str).encode()
+
+
+@singledispatch
+def _encode_content(content) -> bytes:
+    """Bytes to write for file content: bytes as-is, str as UTF-8, dict as indented JSON"""
+    raise TypeError(f"Unsupported content type: {type(content).__name__}")
+
+
+@_encode_content.register
+def _(content: bytes) -> bytes:
+    return content
+
+
+@_encode_content.register
+def _(content: str) -> bytes:
+    return content.encode()
+
+
+@_encode_content.register
+def _(content: dict) -> bytes:
+    return _dump_json(content)
+
+
+def _atomic_write_bytes(path: Path, data: bytes):
+    """Write via a temp file and os.replace so readers never see a partial file"""
+    tmp = path.with_name(f"{path.name}.tmp.{os.getpid()}")
+    tmp.write_bytes(data)
+    os.replace(tmp, path)
+
+
+def _dump_json_line(obj: Any) -> bytes:
+    """Serialize to a single compact JSON line, newline included"""
+    if _ORJSON_OK:
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_APPEND_NEWLINE)
+    return json.dumps(obj, separators=(",", ":"), default=str).encode() + b"\n"
+
+
+def _load_json(data: bytes) -> Any:
+    """Parse JSON bytes, using orjson when available"""
+    if _ORJSON_OK:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+# Manifest lists stored on disk as {"_keys": [...], "_rows": [[...], ...]} so each
+# entry doesn't repeat its field names
+_MANIFEST_COLUMNS = {
+    "inputs": ("path", "metadata", "timestamp"),
+    "outputs": ("path", "metadata", "timestamp"),
+    "logs": ("timestamp", "level", "message"),
+}
+
+
+def _compact_manifest(manifest: Dict[str, Any]) -> Dict[str, Any]:
+    """Shallow copy of `manifest` with uniform entry lists stored column-wise"""
+    compact = dict(manifest)
+    for name, columns in _MANIFEST_COLUMNS.items():
+        entries = manifest.get(name)
+        # Entries with extra or missing fields keep the plain list form
+        if isinstance(entries, list) and all(
+            isinstance(e, dict) and e.keys() == set(columns) for e in entries
+        ):
+            compact[name] = {
+                "_keys": list(columns),
+                "_rows": [[e[c] for c in columns] for e in entries],
+            }
+    return compact
+
+
+def _expand_manifest(manifest: Dict[str, Any]) -> Dict[str, Any]:
+    """Turn column-wise manifest lists back into lists of dicts, in place"""
+    for name in _MANIFEST_COLUMNS:
+        table = manifest.get(name)
+        if isinstance(table, dict) and "_rows" in table:
+            keys = table["_keys"]
+            manifest[name] = [dict(zip(keys, row)) for row in table["_rows"]]
+    return manifest
+
+
+# (epoch second, "YYYY-MM-DDTHH:MM:SS") of the last formatted timestamp
+_ISO_SECOND = [-1, ""]
+
+
+def _utc_iso() -> str:
+    """Current UTC time as ISO 8601 with microseconds, formatting the date part once per second"""
+    ns = time.time_ns()
+    sec, frac = divmod(ns, 1_000_000_000)
+    if _ISO_SECOND[0] != sec:
+        _ISO_SECOND[1] = time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(sec))
+        _ISO_SECOND[0] = sec
+    return f"{_ISO_SECOND[1]}.{frac // 1000:06d}"
+
+
+def _flock_with_timeout(fd: int, timeout: float, what: str):
+    """Take an exclusive flock on `fd`, retrying with backoff until `timeout` seconds"""
+    deadline = time.monotonic() + timeout
+    delay = 0.005
+    while True:
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return
+        except BlockingIOError:
+            if time.monotonic() >= deadline:
+                raise RuntimeError(f"Could not acquire {what} lock within {timeout}s")
+            time.sleep(delay)
+            delay = min(delay * 2, 0.1)
+
+
+# Linux copy-on-write clone ioctl (Python 3.12+ exposes it); None elsewhere
+_FICLONE = getattr(fcntl, "FICLONE", None)
+
+
+def _fast_copy(src: Path, dst: Path):
+    """Copy src to dst with metadata, reflinking on CoW filesystems (Btrfs/XFS)"""
+    if _FICLONE is not None:
+        try:
+            with open(src, 'rb') as s, open(dst, 'wb') as d:
+                fcntl.ioctl(d.fileno(), _FICLONE, s.fileno())
+            shutil.copystat(src, dst)
+            return
+        except OSError:
+            pass  # Not supported here (or cross-device); fall through
+    # copy2 already uses sendfile on Linux for the data copy
+    shutil.copy2(src, dst)
+
+
+# Deletes discarded scratch trees off the caller's path; concurrent.futures joins
+# these workers at interpreter exit
+_GC_POOL = ThreadPoolExecutor(max_workers=2, thread_name_prefix="ws-gc")
+
+
+def _reset_dir(path: Path):
+    """Empty `path` by renaming it aside (one syscall) and deleting the old tree in the background"""
+    trash = path.with_name(f"{path.name}.{secrets.token_hex(8)}.gc")
+    try:
+        os.rename(path, trash)
+    except FileNotFoundError:
+        pass
+    else:
+        _GC_POOL.submit(shutil.rmtree, trash, ignore_errors=True)
+    path.mkdir(parents=True, exist_ok=True)
+
+
+def _make_subdirs(root: Path, *names: str):
+    """Create `root` (with parents) once, then each direct child with a single mkdir"""
+    os.makedirs(root, exist_ok=True)
+    for name in names:
+        try:
+            os.mkdir(os.path.join(root, name))
+        except FileExistsError:
+            pass
+
+
+def _sorted_subdirs(path: str) -> List[str]:
+    """Subdirectory paths of `path`, newest (highest name) first; [] if missing"""
+    try:
+        with os.scandir(path) as entries:
+            dirs = [e.path for e in entries if e.is_dir(follow_symlinks=False)]
+    except FileNotFoundError:
+        return []
+    dirs.sort(reverse=True)
+    return dirs
+
+
+def _read_run_manifest(run_dir: str) -> Optional[Dict[str, Any]]:
+    """Load a run's manifest, folding in its events log while the run is still open"""
+    try:
+        with open(os.path.join(run_dir, "manifest.json"), "rb") as f:
+            manifest = _expand_manifest(_load_json(f.read()))
+    except FileNotFoundError:
+        return None
+    if manifest.get("status") == "running":
+        try:
+            with open(os.path.join(run_dir, "logs", f"{manifest['run_id']}.events.jsonl"), "rb") as f:
+                for line in f:
+                    event = _load_json(line)
+                    manifest.setdefault(event.pop("kind"), []).append(event)
+        except FileNotFoundError:
+            pass
+    return manifest
+
 
 class WorkspaceScope(Enum):
     """Scope of workspace access"""
@@ -73,7 +269,7 @@ class WorkspaceManager:
         self.scope = scope if isinstance(scope, WorkspaceScope) else WorkspaceScope(scope)
         self.scope_id = scope_id or "default"
         self.agent_id = agent_id or "generic"
-        self.workspace_id = workspace_id or f"ws-{uuid.uuid4().hex[:8]}"
+        self.workspace_id = workspace_id or f"ws-{secrets.token_hex(4)}"
         self.storage_config = storage_config
         self.lifecycle_policy = lifecycle_policy
         
@@ -88,24 +284,28 @@ class WorkspaceManager:
     
     def _build_workspace_path(self) -> Path:
         """Build the workspace path following the schema"""
-        return (
-            self.base_path / 
-            "env" / self.env /
-            "org" / self.org_id /
-            "workspaces" / self.scope.value / self.scope_id /
-            "agent" / self.agent_id /
-            "ws" / self.workspace_id
+        # One Path construction instead of a join per component
+        return Path(
+            f"{self.base_path}/env/{self.env}/org/{self.org_id}"
+            f"/workspaces/{self.scope.value}/{self.scope_id}"
+            f"/agent/{self.agent_id}/ws/{self.workspace_id}"
         )
     
     def _initialize_workspace(self):
         """Create workspace directory structure"""
-        self.current_dir.mkdir(parents=True, exist_ok=True)
-        self.runs_dir.mkdir(parents=True, exist_ok=True)
-        self.scratch_dir.mkdir(parents=True, exist_ok=True)
+        _make_subdirs(self.workspace_root, "current", "runs", "scratch")
+        
+        # Resolved once; the workspace root is fixed for the manager's lifetime
+        self._current_dir_resolved = self.current_dir.resolve()
+        self._scratch_dir_resolved = self.scratch_dir.resolve()
         
-        # Create workspace metadata
+        # Create workspace metadata; O_EXCL makes "already exists" the cheap path
         metadata_path = self.workspace_root / "workspace_metadata.json"
-        if not metadata_path.exists():
+        try:
+            fd = os.open(metadata_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o644)
+        except FileExistsError:
+            return
+        with os.fdopen(fd, 'wb') as f:
             metadata = {
                 "workspace_id": self.workspace_id,
                 "agent_id": self.agent_id,
@@ -113,11 +313,10 @@ class WorkspaceManager:
                 "scope_id": self.scope_id,
                 "org_id": self.org_id,
                 "env": self.env,
-                "created_at": datetime.utcnow().isoformat(),
+                "created_at": _utc_iso(),
                 "version": "1.0"
             }
-            with open(metadata_path, 'w') as f:
-                json.dump(metadata, f, indent=2)
+            f.write(_dump_json(metadata))
     
     def create_run(self, run_id: Optional[str] = None) -> 'RunContext':
         """
@@ -130,16 +329,10 @@ class WorkspaceManager:
             RunContext object for managing the run
         """
         if run_id is None:
-            run_id = f"run-{uuid.uuid4().hex[:12]}"
-        
-        now = datetime.utcnow()
-        run_path = (
-            self.runs_dir / 
-            str(now.year) / 
-            f"{now.month:02d}" / 
-            f"{now.day:02d}" / 
-            run_id
-        )
+            run_id = f"run-{secrets.token_hex(6)}"
+        
+        now = time.gmtime()
+        run_path = Path(f"{self.runs_dir}/{now.tm_year}/{now.tm_mon:02d}/{now.tm_mday:02d}/{run_id}")
         
         return RunContext(
             run_path=run_path,
@@ -158,15 +351,11 @@ class WorkspaceManager:
         Yields:
             Lock context
         """
-        lock_file = self.workspace_root / ".lock"
-        lock_file.touch(exist_ok=True)
-        
-        with open(lock_file, 'w') as f:
+        # A fresh open file description per call, so threads exclude each other too
+        with open(self.workspace_root / ".lock", 'a') as f:
+            _flock_with_timeout(f.fileno(), timeout, "workspace")
             try:
-                fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
                 yield
-            except IOError:
-                raise RuntimeError(f"Could not acquire workspace lock within {timeout}s")
             finally:
                 fcntl.flock(f.fileno(), fcntl.LOCK_UN)
     
@@ -174,40 +363,36 @@ class WorkspaceManager:
         """Get path within current directory"""
         path = self.current_dir / relative_path
         # Ensure path is within current directory (security)
-        path.resolve().relative_to(self.current_dir.resolve())
+        path.resolve().relative_to(self._current_dir_resolved)
         return path
     
     def get_scratch_path(self, relative_path: str = "") -> Path:
         """Get path within scratch directory"""
         path = self.scratch_dir / relative_path
-        path.resolve().relative_to(self.scratch_dir.resolve())
+        path.resolve().relative_to(self._scratch_dir_resolved)
         return path
     
-    def cleanup_scratch(self):
-        """Remove all files in scratch directory"""
-        if self.scratch_dir.exists():
-            shutil.rmtree(self.scratch_dir)
-            self.scratch_dir.mkdir(parents=True, exist_ok=True)
-    
-    def write_current_file(self, filename: str, content: Union[str, bytes]):
+    def write_current_file(self, filename: str, content: Union[str, bytes, Dict[str, Any]]):
         """
         Write content to a file in the current directory
         
         Args:
             filename: Name of the file to write
-            content: Content to write (string or bytes)
+            content: Content to write (string, bytes, or JSON-serializable dict)
         """
         path = self.get_current_path(filename)
         
         # Create parent directories if needed
         path.parent.mkdir(parents=True, exist_ok=True)
         
-        # Write content based on type
-        with self.lock_workspace():
-            if isinstance(content, str):
-                path.write_text(content)
-            else:
-                path.write_bytes(content)
+        data = _encode_content(content)
+        
+        # Lock only the target file so writers of different files never block
+        # each other; truncate after locking so a concurrent writer can't interleave
+        with open(os.open(path, os.O_WRONLY | os.O_CREAT, 0o666), 'wb') as f:
+            _flock_with_timeout(f.fileno(), 30, f"file {filename}")
+            f.truncate(0)
+            f.write(data)
     
     def read_current_file(self, filename: str) -> Optional[Union[str, bytes]]:
         """
@@ -220,13 +405,22 @@ class WorkspaceManager:
             File content as string or bytes, or None if file doesn't exist
         """
         path = self.get_current_path(filename)
-        if not path.exists():
+        
+        # Let the read report a missing file instead of a separate exists() stat
+        try:
+            data = path.read_bytes()
+        except FileNotFoundError:
             return None
         
+        # Decode the bytes already read rather than re-reading binary files
         try:
-            return path.read_text()
+            text = data.decode()
         except UnicodeDecodeError:
-            return path.read_bytes()
+            return data
+        # Keep read_text()'s universal-newline behaviour
+        if "\r" in text:
+            text = text.replace("\r\n", "\n").replace("\r", "\n")
+        return text
     
     def delete_current_file(self, filename: str):
         """
@@ -236,9 +430,8 @@ class WorkspaceManager:
             filename: Name of the file to delete
         """
         path = self.get_current_path(filename)
-        if path.exists():
-            with self.lock_workspace():
-                path.unlink()
+        # unlink is atomic; no lock needed
+        path.unlink(missing_ok=True)
     
     def list_current_files(self) -> List[str]:
         """
@@ -247,10 +440,11 @@ class WorkspaceManager:
         Returns:
             List of filenames (relative to current directory)
         """
-        if not self.current_dir.exists():
+        try:
+            with os.scandir(self.current_dir) as it:
+                return [e.name for e in it if e.is_file(follow_symlinks=False)]
+        except FileNotFoundError:
             return []
-        
-        return [f.name for f in self.current_dir.iterdir() if f.is_file()]
     
     def list_runs(self, limit: int = 100) -> List[Dict[str, Any]]:
         """
@@ -264,27 +458,15 @@ class WorkspaceManager:
         """
         runs = []
         
-        if not self.runs_dir.exists():
-            return runs
-        
-        # Walk through year/month/day structure
-        for year_dir in sorted(self.runs_dir.iterdir(), reverse=True):
-            if not year_dir.is_dir():
-                continue
-            for month_dir in sorted(year_dir.iterdir(), reverse=True):
-                if not month_dir.is_dir():
-                    continue
-                for day_dir in sorted(month_dir.iterdir(), reverse=True):
-                    if not day_dir.is_dir():
-                        continue
-                    for run_dir in sorted(day_dir.iterdir(), reverse=True):
-                        if not run_dir.is_dir():
+        # Walk year/month/day/run newest first, stopping as soon as we have enough
+        for year in _sorted_subdirs(str(self.runs_dir)):
+            for month in _sorted_subdirs(year):
+                for day in _sorted_subdirs(month):
+                    for run_dir in _sorted_subdirs(day):
+                        manifest = _read_run_manifest(run_dir)
+                        if manifest is None:
                             continue
-                        
-                        manifest_path = run_dir / "manifest.json"
-                        if manifest_path.exists():
-                            with open(manifest_path) as f:
-                                runs.append(json.load(f))
+                        runs.append(manifest)
                         
                         if len(runs) >= limit:
                             return runs
@@ -293,9 +475,7 @@ class WorkspaceManager:
     
     def cleanup_scratch(self):
         """Clean up the scratch directory (called automatically at end of run)"""
-        if self.scratch_dir.exists():
-            shutil.rmtree(self.scratch_dir)
-            self.scratch_dir.mkdir(parents=True, exist_ok=True)
+        _reset_dir(self.scratch_dir)
     
     def clean_scratch(self):
         """Alias for cleanup_scratch for backwards compatibility"""
@@ -324,55 +504,43 @@ class RunContext:
         self.logs_dir = run_path / "logs"
         self.scratch_dir = run_path / "scratch"
         self.manifest_path = run_path / "manifest.json"
+        # Append-only record of inputs/outputs/logs while the run is in progress;
+        # close() folds it into the manifest and removes it
+        self.events_path = self.logs_dir / f"{run_id}.events.jsonl"
+        self._events_fp = None
+        self._log_fp = None
+        self._active = False  # Inside a with block: keep append handles open
+        self._closed = False
         
         # Initialize manifest
         self.manifest = {
             "run_id": run_id,
-            "started_at": datetime.utcnow().isoformat(),
+            "started_at": _utc_iso(),
             "status": "running",
             "inputs": [],
             "outputs": [],
             "logs": []
         }
         
-        # Create directories
+        # Create directories and the initial manifest, so runs used without
+        # a with block are still listed
         self._ensure_dirs()
+        self._write_manifest()
     
     def _ensure_dirs(self):
         """Ensure all run directories exist"""
-        self.inputs_dir.mkdir(parents=True, exist_ok=True)
-        self.outputs_dir.mkdir(parents=True, exist_ok=True)
-        self.logs_dir.mkdir(parents=True, exist_ok=True)
-        self.scratch_dir.mkdir(parents=True, exist_ok=True)
+        _make_subdirs(self.run_path, "inputs", "outputs", "logs", "scratch")
     
     def write_input(self, filename: str, content: Union[str, bytes, Dict[str, Any]]):
         """Write content to the inputs directory"""
         path = self.inputs_dir / filename
-        
-        # Convert dict to JSON if needed
-        if isinstance(content, dict):
-            content = json.dumps(content, indent=2)
-            
-        if isinstance(content, str):
-            path.write_text(content)
-        else:
-            path.write_bytes(content)
-        
+        path.write_bytes(_encode_content(content))
         return path
     
     def write_output(self, filename: str, content: Union[str, bytes, Dict[str, Any]]):
         """Write content to the outputs directory"""
         path = self.outputs_dir / filename
-        
-        # Convert dict to JSON if needed
-        if isinstance(content, dict):
-            content = json.dumps(content, indent=2)
-            
-        if isinstance(content, str):
-            path.write_text(content)
-        else:
-            path.write_bytes(content)
-        
+        path.write_bytes(_encode_content(content))
         return path
     
     def write_log(self, filename: str, content: str):
@@ -383,89 +551,119 @@ class RunContext:
     
     def write_manifest(self, data: Dict[str, Any]):
         """Write run manifest data"""
-        with open(self.manifest_path, "w") as f:
-            json.dump(data, f, indent=2)
+        _atomic_write_bytes(self.manifest_path, _dump_json(_compact_manifest(data)))
     
     def read_manifest(self) -> Dict[str, Any]:
-        """Read run manifest data"""
-        if self.manifest_path.exists():
-            with open(self.manifest_path, "r") as f:
-                return json.load(f)
-        return {}
+        """Read run manifest data, including events recorded since it was last written"""
+        return _read_run_manifest(str(self.run_path)) or {}
     
     def cleanup_scratch(self):
         """Clean up the scratch directory"""
-        if self.scratch_dir.exists():
-            shutil.rmtree(self.scratch_dir)
-            self.scratch_dir.mkdir(parents=True, exist_ok=True)
+        _reset_dir(self.scratch_dir)
     
     def __enter__(self):
         """Enter run context"""
-        # Create run directories
-        self.inputs_dir.mkdir(parents=True, exist_ok=True)
-        self.outputs_dir.mkdir(parents=True, exist_ok=True)
-        self.logs_dir.mkdir(parents=True, exist_ok=True)
-        
-        # Write initial manifest
-        self._write_manifest()
-        
+        # Run directories and the initial manifest are created in __init__
+        self._active = True
         return self
     
     def __exit__(self, exc_type, exc_val, exc_tb):
         """Exit run context"""
-        # Update manifest
-        self.manifest["completed_at"] = datetime.utcnow().isoformat()
-        self.manifest["status"] = "failed" if exc_type else "completed"
-        
-        if exc_type:
-            self.manifest["error"] = {
-                "type": exc_type.__name__,
-                "message": str(exc_val)
-            }
-        
-        self._write_manifest()
+        self.close(exc_val if exc_type else None)
         
         # Cleanup scratch
         self.workspace_manager.cleanup_scratch()
         
         return False  # Don't suppress exceptions
     
+    def close(self, error: Optional[BaseException] = None):
+        """
+        Finish the run: record its final status, write the full manifest and
+        drop the events log it replaces. Called by __exit__; call it directly
+        for runs used without a with block.
+        """
+        if self._closed:
+            return
+        self.manifest["completed_at"] = _utc_iso()
+        self.manifest["status"] = "failed" if error is not None else "completed"
+        
+        if error is not None:
+            self.manifest["error"] = {
+                "type": type(error).__name__,
+                "message": str(error)
+            }
+        
+        self._close_event_files()
+        self._write_manifest()
+        self.events_path.unlink(missing_ok=True)
+        self._active = False
+        self._closed = True
+    
     def _write_manifest(self):
         """Write manifest to disk"""
-        with open(self.manifest_path, 'w') as f:
-            json.dump(self.manifest, f, indent=2)
+        _atomic_write_bytes(self.manifest_path, _dump_json(_compact_manifest(self.manifest)))
+    
+    def _record_event(self, kind: str, entry: Dict[str, Any]):
+        """Add an entry to the in-memory manifest and append it to the events file"""
+        self.manifest[kind].append(entry)
+        if self._closed:
+            # No events log after close(); the manifest is the only record
+            self._write_manifest()
+            return
+        line = _dump_json_line({"kind": kind, **entry})
+        if self._events_fp is not None:
+            self._events_fp.write(line)
+        elif self._active:
+            self._events_fp = open(self.events_path, "ab", buffering=0)
+            self._events_fp.write(line)
+        else:
+            # Outside a with block nothing guarantees close(), so don't hold a handle
+            with open(self.events_path, "ab") as f:
+                f.write(line)
+    
+    def _close_event_files(self):
+        """Close append handles opened during the run"""
+        for fp in (self._events_fp, self._log_fp):
+            if fp is not None:
+                fp.close()
+        self._events_fp = None
+        self._log_fp = None
     
     def add_input(self, file_path: str, metadata: Optional[Dict] = None):
         """Record an input file"""
-        self.manifest["inputs"].append({
+        self._record_event("inputs", {
             "path": file_path,
             "metadata": metadata or {},
-            "timestamp": datetime.utcnow().isoformat()
+            "timestamp": _utc_iso()
         })
-        self._write_manifest()
     
     def add_output(self, file_path: str, metadata: Optional[Dict] = None):
         """Record an output file"""
-        self.manifest["outputs"].append({
+        self._record_event("outputs", {
             "path": file_path,
             "metadata": metadata or {},
-            "timestamp": datetime.utcnow().isoformat()
+            "timestamp": _utc_iso()
         })
-        self._write_manifest()
     
     def add_log(self, message: str, level: str = "info"):
         """Add a log entry"""
         log_entry = {
-            "timestamp": datetime.utcnow().isoformat(),
+            "timestamp": _utc_iso(),
             "level": level,
             "message": message
         }
-        self.manifest["logs"].append(log_entry)
+        self._record_event("logs", log_entry)
         
         # Also write to log file
-        log_file = self.logs_dir / f"{self.run_id}.log"
-        with open(log_file, 'a') as f:
-            f.write(f"[{log_entry['timestamp']}] {level.upper()}: {message}\n")
+        line = f"[{log_entry['timestamp']}] {level.upper()}: {message}\n"
+        if self._log_fp is not None:
+            self._log_fp.write(line)
+        elif self._active:
+            self._log_fp = open(self.logs_dir / f"{self.run_id}.log", 'a', buffering=1)
+            self._log_fp.write(line)
+        else:
+            with open(self.logs_dir / f"{self.run_id}.log", 'a') as f:
+                f.write(line)
     
     def promote_to_current(self, file_path: str, destination: str = None):
         """
@@ -476,13 +674,14 @@ class RunContext:
             destination: Destination path in current directory (defaults to same name)
         """
         source = self.outputs_dir / file_path
-        if not source.exists():
-            raise FileNotFoundError(f"Output file not found: {file_path}")
         
         dest_path = destination or file_path
         dest = self.workspace_manager.current_dir / dest_path
         dest.parent.mkdir(parents=True, exist_ok=True)
         
-        shutil.copy2(source, dest)
+        try:
+            _fast_copy(source, dest)
+        except FileNotFoundError:
+            raise FileNotFoundError(f"Output file not found: {file_path}") from None
         
         self.add_log(f"Promoted {file_path} to current workspace", "info")
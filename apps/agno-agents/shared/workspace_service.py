@@ -6,6 +6,9 @@ environments (local, S3, etc.) and handles user context extraction from requests
 """
 
 import os
+import re
+import threading
+from collections import OrderedDict
 from pathlib import Path
 from typing import Dict, Any, Optional, Union, List
 import json
@@ -24,6 +27,12 @@ from .storage_config import StorageConfig, StorageBackend, DEFAULT_STORAGE_CONFI
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Max WorkspaceManager instances kept by WorkspaceService.get_workspace
+WORKSPACE_CACHE_SIZE = 2048
+
+# First path segment, minus a trailing "-agent": "/stock-agent/run" -> "stock"
+_AGENT_ID_RE = re.compile(r"^/?([^/]+?)(?:-agent)?(?:/|$)")
+
 
 class RequestContext(BaseModel):
     """User context extracted from request for workspace operations"""
@@ -53,6 +62,8 @@ class WorkspaceService:
             storage_config: Optional storage configuration
         """
         self.env = os.getenv("ENV", "dev")
+        # Org used when a request carries no X-Org-ID header
+        self.default_org_id = os.getenv("DEFAULT_ORG_ID", "default")
         self.base_path = os.getenv("WORKSPACE_BASE_PATH", "./workspaces")
         
         # Determine storage backend from environment
@@ -82,9 +93,13 @@ class WorkspaceService:
                 encryption_enabled=True
             )
         
+        # (env, org, scope, scope_id, agent, workspace_id) -> WorkspaceManager, LRU ordered
+        self._workspaces: "OrderedDict[tuple, WorkspaceManager]" = OrderedDict()
+        self._workspaces_lock = threading.Lock()
+        
         logger.info(f"Workspace service initialized with {backend.value} backend in {self.env} environment")
     
-    async def extract_context_from_request(self, request: Request) -> RequestContext:
+    def extract_context_from_request(self, request: Request) -> RequestContext:
         """
         Extract user context from request headers/auth
         
@@ -98,25 +113,16 @@ class WorkspaceService:
         # For now, we'll use headers or query params
         
         # Try to get from headers first
-        user_id = request.headers.get("X-User-ID")
-        org_id = request.headers.get("X-Org-ID") or os.getenv("DEFAULT_ORG_ID", "default")
-        workspace_id = request.headers.get("X-Workspace-ID")
-        agent_id = request.headers.get("X-Agent-ID")
-        
-        # If not in headers, try query params
-        if not user_id:
-            user_id = request.query_params.get("user_id", str(uuid.uuid4()))
+        headers = request.headers
+        user_id = headers.get("X-User-ID") or request.query_params.get("user_id") or str(uuid.uuid4())
+        org_id = headers.get("X-Org-ID") or self.default_org_id
+        workspace_id = headers.get("X-Workspace-ID")
+        agent_id = headers.get("X-Agent-ID")
         
         if not agent_id:
             # Extract agent ID from path
-            path = request.url.path
-            if path.startswith("/"):
-                path = path[1:]
-            parts = path.split("/")
-            if parts:
-                agent_id = parts[0].replace("-agent", "")
-            else:
-                agent_id = "generic"
+            match = _AGENT_ID_RE.match(request.url.path)
+            agent_id = match.group(1) if match else "generic"
         
         return RequestContext(
             user_id=user_id,
@@ -149,8 +155,19 @@ class WorkspaceService:
             scope_id = context.org_id
         elif scope == WorkspaceScope.GLOBAL:
             scope_id = "global"
-            
-        return WorkspaceManager(
+        
+        # Without a workspace_id every call gets a fresh generated workspace, so only
+        # explicitly addressed workspaces are reused
+        key = None
+        if context.workspace_id:
+            key = (context.env, context.org_id, scope, scope_id, context.agent_id, context.workspace_id)
+            with self._workspaces_lock:
+                workspace = self._workspaces.get(key)
+                if workspace is not None:
+                    self._workspaces.move_to_end(key)
+                    return workspace
+        
+        workspace = WorkspaceManager(
             base_path=self.storage_config.base_path,
             env=context.env,
             org_id=context.org_id,
@@ -160,6 +177,13 @@ class WorkspaceService:
             workspace_id=context.workspace_id,
             storage_config=self.storage_config
         )
+        
+        if key is not None:
+            with self._workspaces_lock:
+                self._workspaces[key] = workspace
+                if len(self._workspaces) > WORKSPACE_CACHE_SIZE:
+                    self._workspaces.popitem(last=False)
+        return workspace
     
     def create_run(
         self,
@@ -201,11 +225,7 @@ class WorkspaceService:
             Path to the written file
         """
         workspace = self.get_workspace(context, scope)
-        
-        # Convert dict to JSON string if needed
-        if isinstance(content, dict):
-            content = json.dumps(content, indent=2)
-            
+        # Dicts are serialized to JSON by the workspace
         workspace.write_current_file(filename, content)
         return workspace.get_current_path(filename)
     
@@ -1,29 +1,39 @@
 import os
+import anyio
+import orjson
 from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse, Response
 from fastapi.middleware.cors import CORSMiddleware
 from dotenv import load_dotenv
 from contextlib import asynccontextmanager
 
+# Load environment variables from .env file before the services read them at import
+load_dotenv(dotenv_path=os.path.join(os.path.dirname(__file__), '.env'))
+
 from services.dynamodb import db_service
+from middleware.compression import EventStreamAwareGZipMiddleware
 from routers import chat, conversations, models, attachments
 
-# Load environment variables from .env file
-load_dotenv(dotenv_path=os.path.join(os.path.dirname(__file__), '.env'))
+# Log environment variables status (opt-in with DEBUG_ENV=1 to keep startup output quiet)
+if os.getenv("DEBUG_ENV") == "1":
+    print(f"Environment variables loaded:")
+    print(f"  AWS_REGION: {os.getenv('AWS_REGION', 'Not set')}")
+    print(f"  DYNAMODB_TABLE_NAME: {os.getenv('DYNAMODB_TABLE_NAME', 'Not set')}")
+    print(f"  OPENAI_API_KEY: {'Set' if os.getenv('OPENAI_API_KEY') else 'Not set'}")
+    print(f"  ANTHROPIC_API_KEY: {'Set' if os.getenv('ANTHROPIC_API_KEY') else 'Not set'}")
+    print(f"  GOOGLE_API_KEY: {'Set' if os.getenv('GOOGLE_API_KEY') else 'Not set'}")
+    print(f"  COHERE_API_KEY: {'Set' if os.getenv('COHERE_API_KEY') else 'Not set'}")
+    print(f"  GROQ_API_KEY: {'Set' if os.getenv('GROQ_API_KEY') else 'Not set'}")
 
-# Log environment variables status (for debugging)
-print(f"Environment variables loaded:")
-print(f"  AWS_REGION: {os.getenv('AWS_REGION', 'Not set')}")
-print(f"  DYNAMODB_TABLE_NAME: {os.getenv('DYNAMODB_TABLE_NAME', 'Not set')}")
-print(f"  OPENAI_API_KEY: {'Set' if os.getenv('OPENAI_API_KEY') else 'Not set'}")
-print(f"  ANTHROPIC_API_KEY: {'Set' if os.getenv('ANTHROPIC_API_KEY') else 'Not set'}")
-print(f"  GOOGLE_API_KEY: {'Set' if os.getenv('GOOGLE_API_KEY') else 'Not set'}")
-print(f"  COHERE_API_KEY: {'Set' if os.getenv('COHERE_API_KEY') else 'Not set'}")
-print(f"  GROQ_API_KEY: {'Set' if os.getenv('GROQ_API_KEY') else 'Not set'}")
+# Worker threads available to run_in_threadpool
+THREADPOOL_SIZE = 100
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup logic
     # DynamoDB table creation is handled automatically in DynamoDBService constructor
+    # Room for blocking work (upload spooling, sync dependencies) beyond anyio's default 40 threads
+    anyio.to_thread.current_default_thread_limiter().total_tokens = THREADPOOL_SIZE
     yield
     # Shutdown logic
 
@@ -31,48 +41,58 @@ app = FastAPI(
     title="AI Chat API",
     description="Backend API for AI chat application with multiple models, attachments, and DynamoDB storage",
     version="1.0.0",
-    lifespan=lifespan
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse
 )
 
-# CORS middleware
+# CORS middleware; explicit origin/method lists skip wildcard handling, request headers stay open
+CORS_ORIGINS = frozenset({"http://localhost:3000", "http://localhost:3001"})  # Add your frontend URLs
+CORS_METHODS = ["GET", "POST", "PUT", "DELETE", "OPTIONS"]
+
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=["http://localhost:3000", "http://localhost:3001"],  # Add your frontend URLs
+    allow_origins=CORS_ORIGINS,
     allow_credentials=True,
-    allow_methods=["*"],
+    allow_methods=CORS_METHODS,
     allow_headers=["*"],
 )
 
+# Compress JSON bodies; SSE streams are passed through untouched
+app.add_middleware(EventStreamAwareGZipMiddleware, minimum_size=512, compresslevel=6)
+
 # Include routers
 app.include_router(chat.router, prefix="/api/chat", tags=["chat"])
 app.include_router(attachments.router, prefix="/api/attachments", tags=["attachments"])
 app.include_router(conversations.router, prefix="/api/conversations", tags=["conversations"])
 app.include_router(models.router, prefix="/api/models", tags=["models"])
 
+# The root listing never changes, so serialize it once
+_ROOT_BODY = orjson.dumps({
+    "message": "AI Chat API is running",
+    "version": "1.0.0",
+    "features": [
+        "Multi-model chat support",
+        "Image upload and vision chat",
+        "Document upload and processing", 
+        "Conversation management",
+        "DynamoDB storage"
+    ],
+    "endpoints": {
+        "chat": "/api/chat/send",
+        "attachments": {
+            "upload_image": "/api/attachments/upload-image",
+            "upload_document": "/api/attachments/upload-document", 
+            "supported_types": "/api/attachments/supported-types",
+            "generate_image": "/api/attachments/generate-image"
+        },
+        "conversations": "/api/conversations",
+        "models": "/api/models"
+    }
+})
+
 @app.get("/")
 async def root():
-    return {
-        "message": "AI Chat API is running",
-        "version": "1.0.0",
-        "features": [
-            "Multi-model chat support",
-            "Image upload and vision chat",
-            "Document upload and processing", 
-            "Conversation management",
-            "DynamoDB storage"
-        ],
-        "endpoints": {
-            "chat": "/api/chat/send",
-            "attachments": {
-                "upload_image": "/api/attachments/upload-image",
-                "upload_document": "/api/attachments/upload-document", 
-                "supported_types": "/api/attachments/supported-types",
-                "generate_image": "/api/attachments/generate-image"
-            },
-            "conversations": "/api/conversations",
-            "models": "/api/models"
-        }
-    }
+    return Response(content=_ROOT_BODY, media_type="application/json")
 
 @app.get("/health")
 async def health_check():
@@ -120,5 +140,8 @@ if __name__ == "__main__":
         host="0.0.0.0",
         port=8001,
         reload=True,
+        # uvicorn[standard] ships uvloop and httptools; use them explicitly
+        loop="uvloop",
+        http="httptools",
         log_level="info"
     )
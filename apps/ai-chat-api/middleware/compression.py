@@ -0,0 +1,35 @@
+"""
+Response compression middleware for the AI Chat API
+"""
+from starlette.datastructures import Headers
+from starlette.middleware.gzip import GZipMiddleware, GZipResponder
+from starlette.types import Message, Receive, Scope, Send
+
+
+class _EventStreamPassthroughResponder(GZipResponder):
+    """GZipResponder that leaves text/event-stream bodies uncompressed"""
+
+    async def send_with_gzip(self, message: Message) -> None:
+        await super().send_with_gzip(message)
+        if message["type"] == "http.response.start":
+            content_type = Headers(raw=message["headers"]).get("content-type", "")
+            if content_type.startswith("text/event-stream"):
+                # Same path as an already-encoded response: every frame is sent as-is
+                self.content_encoding_set = True
+
+
+class EventStreamAwareGZipMiddleware(GZipMiddleware):
+    """
+    GZip JSON and other buffered responses, but not SSE streams.
+    The gzip stream only emits output once zlib fills a block, so compressing
+    text/event-stream would hold tokens back instead of sending them as generated.
+    """
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] == "http" and "gzip" in Headers(scope=scope).get("Accept-Encoding", ""):
+            responder = _EventStreamPassthroughResponder(
+                self.app, self.minimum_size, compresslevel=self.compresslevel
+            )
+            await responder(scope, receive, send)
+            return
+        await self.app(scope, receive, send)
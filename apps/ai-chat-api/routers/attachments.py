@@ -3,14 +3,14 @@ Attachment Support Router for LiteLLM
 Handles image uploads and vision models
 """
 from fastapi import APIRouter, HTTPException, Depends, UploadFile, File, Form
-from fastapi.responses import StreamingResponse
+from fastapi.responses import Response, StreamingResponse
 from typing import Optional
-import json
+import orjson
 import base64
-from datetime import datetime
+import asyncio
 import uuid
 
-from models.chat import ChatMessage, MessageRole
+from models.chat import MessageRole
 from services.litellm_service import litellm_service
 from services.dynamodb import db_service
 from services.attachment_service import attachment_service
@@ -35,6 +35,38 @@ SUPPORTED_TEXT_TYPES = {
     "text/csv"
 }
 
+# Models that accept image input; anything else is swapped for gpt-4o
+VISION_MODELS = frozenset({
+    "gpt-4o",
+    "gpt-4o-mini",
+    "claude-3-opus-20240229",
+    "claude-3-sonnet-20240229",
+    "gemini-pro-vision"
+})
+
+# Final SSE frame of the vision stream never varies
+_SSE_DONE_FRAME = b"data: %b\n\n" % orjson.dumps({'content': '', 'done': True})
+
+# Upload read size; oversized files are rejected before they are fully buffered
+UPLOAD_CHUNK_SIZE = 64 * 1024
+
+
+async def read_upload(file: UploadFile, max_size: int, too_large_detail: str) -> bytes:
+    """Read an upload in chunks, raising 400 as soon as it exceeds max_size"""
+    chunks = []
+    size = 0
+    while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+        size += len(chunk)
+        if size > max_size:
+            raise HTTPException(status_code=400, detail=too_large_detail)
+        chunks.append(chunk)
+    return b"".join(chunks)
+
+
+def image_data_uri(content_type: str, data: bytes) -> str:
+    """Build a base64 data URI, formatting the prefix into the encoded bytes before a single ASCII decode"""
+    return (b"data:%b;base64,%b" % (content_type.encode('ascii'), base64.b64encode(data))).decode('ascii')
+
 @router.post("/upload-image")
 async def upload_image_chat(
     file: UploadFile = File(...),
@@ -57,21 +89,14 @@ async def upload_image_chat(
     
     # Validate file size (max 10MB)
     max_size = 10 * 1024 * 1024  # 10MB
-    file_content = await file.read()
-    if len(file_content) > max_size:
-        raise HTTPException(
-            status_code=400,
-            detail="File too large. Maximum size is 10MB."
-        )
+    file_content = await read_upload(file, max_size, "File too large. Maximum size is 10MB.")
     
     try:
-        # Convert image to base64
-        base64_image = base64.b64encode(file_content).decode('utf-8')
-        image_url = f"data:{file.content_type};base64,{base64_image}"
+        # Build the data URI off the event loop; the intermediate base64 buffer is dropped inside
+        image_url = await asyncio.to_thread(image_data_uri, file.content_type, file_content)
         
         # Ensure we're using a vision-capable model
-        vision_models = ["gpt-4o", "gpt-4o-mini", "claude-3-opus-20240229", "claude-3-sonnet-20240229", "gemini-pro-vision"]
-        if model_id not in vision_models:
+        if model_id not in VISION_MODELS:
             model_id = "gpt-4o"  # Default to GPT-4o for vision
         
         # Prepare messages for vision model
@@ -113,36 +138,36 @@ async def upload_image_chat(
                                 if choice.delta.content:
                                     content = choice.delta.content
                                     full_response += content
-                                    yield f"data: {json.dumps({'content': content, 'done': False})}\n\n"
+                                    yield b"data: %b\n\n" % orjson.dumps({'content': content, 'done': False})
                     
-                    # Save conversation to DynamoDB
+                    # Queue the save before the final frame; a client disconnecting
+                    # on done would otherwise close the generator before it runs
                     if conversation_id:
-                        conversation = await db_service.get_conversation_by_id(conversation_id)
+                        conversation = await db_service.get_conversation(conversation_id, current_user["id"])
                         if conversation:
-                            # Add user message with attachment info
-                            user_message = ChatMessage(
+                            # Append this turn to the stored conversation
+                            user_message = litellm_service.create_message(
                                 role=MessageRole.USER,
-                                content=f"{message} [Image: {file.filename}]",
-                                timestamp=datetime.utcnow()
-                            )
-                            # Add AI response
-                            ai_message = ChatMessage(
+                                content=f"{message} [Image: {file.filename}]"
+                            ).model_dump(mode='json')
+                            ai_message = litellm_service.create_message(
                                 role=MessageRole.ASSISTANT,
                                 content=full_response,
-                                timestamp=datetime.utcnow(),
                                 model=model_id
+                            ).model_dump(mode='json')
+                            db_service.save_conversation_in_background(
+                                {'id': conversation.id},
+                                [user_message, ai_message]
                             )
-                            conversation.messages.extend([user_message, ai_message])
-                            await db_service.save_conversation(conversation.dict())
                     
-                    yield f"data: {json.dumps({'content': '', 'done': True})}\n\n"
+                    yield _SSE_DONE_FRAME
                     
                 except Exception as e:
-                    yield f"data: {json.dumps({'error': str(e), 'done': True})}\n\n"
+                    yield b"data: %b\n\n" % orjson.dumps({'error': str(e), 'done': True})
             
             return StreamingResponse(
                 generate_stream(),
-                media_type="text/plain",
+                media_type="text/event-stream",
                 headers={"Cache-Control": "no-cache", "Connection": "keep-alive"}
             )
         
@@ -159,21 +184,19 @@ async def upload_image_chat(
             
             # Save conversation if provided
             if conversation_id:
-                conversation = await db_service.get_conversation_by_id(conversation_id)
+                conversation = await db_service.get_conversation(conversation_id, current_user["id"])
                 if conversation:
-                    user_message = ChatMessage(
+                    # Append this turn to the stored conversation
+                    user_message = litellm_service.create_message(
                         role=MessageRole.USER,
-                        content=f"{message} [Image: {file.filename}]",
-                        timestamp=datetime.utcnow()
-                    )
-                    ai_message = ChatMessage(
+                        content=f"{message} [Image: {file.filename}]"
+                    ).model_dump(mode='json')
+                    ai_message = litellm_service.create_message(
                         role=MessageRole.ASSISTANT,
                         content=ai_response,
-                        timestamp=datetime.utcnow(),
                         model=model_id
-                    )
-                    conversation.messages.extend([user_message, ai_message])
-                    await db_service.save_conversation(conversation.dict())
+                    ).model_dump(mode='json')
+                    await db_service.append_messages(conversation.id, [user_message, ai_message])
             
             return {
                 "response": ai_response,
@@ -210,16 +233,12 @@ async def upload_document_chat(
     
     # Validate file size (max 1MB for text files)
     max_size = 1 * 1024 * 1024  # 1MB
-    file_content = await file.read()
-    if len(file_content) > max_size:
-        raise HTTPException(
-            status_code=400,
-            detail="File too large. Maximum size is 1MB for text files."
-        )
+    file_content = await read_upload(file, max_size, "File too large. Maximum size is 1MB for text files.")
     
     try:
-        # Read file content as text
-        text_content = file_content.decode('utf-8')
+        # Read file content as text, off the event loop
+        text_content = await asyncio.to_thread(file_content.decode, 'utf-8')
+        preview = text_content[:200] + ("..." if len(text_content) > 200 else "")
         
         # Prepare enhanced message with file content
         enhanced_message = f"""
@@ -250,24 +269,24 @@ Please analyze the document content above and respond to my message.
         )
         
         ai_response = response.choices[0].message.content
+        # The full document text is no longer needed; don't hold it while saving
+        del text_content, enhanced_message, messages
         
         # Save conversation if provided
         if conversation_id:
-            conversation = await db_service.get_conversation_by_id(conversation_id)
+            conversation = await db_service.get_conversation(conversation_id, current_user["id"])
             if conversation:
-                user_message = ChatMessage(
+                # Append this turn to the stored conversation
+                user_message = litellm_service.create_message(
                     role=MessageRole.USER,
-                    content=f"{message} [Document: {file.filename}]",
-                    timestamp=datetime.utcnow()
-                )
-                ai_message = ChatMessage(
+                    content=f"{message} [Document: {file.filename}]"
+                ).model_dump(mode='json')
+                ai_message = litellm_service.create_message(
                     role=MessageRole.ASSISTANT,
                     content=ai_response,
-                    timestamp=datetime.utcnow(),
                     model=model_id
-                )
-                conversation.messages.extend([user_message, ai_message])
-                await db_service.save_conversation(conversation.dict())
+                ).model_dump(mode='json')
+                await db_service.append_messages(conversation.id, [user_message, ai_message])
         
         return {
             "response": ai_response,
@@ -277,7 +296,7 @@ Please analyze the document content above and respond to my message.
                 "content_type": file.content_type,
                 "size": len(file_content),
                 "processed": True,
-                "preview": text_content[:200] + "..." if len(text_content) > 200 else text_content
+                "preview": preview
             }
         }
         
@@ -289,26 +308,29 @@ Please analyze the document content above and respond to my message.
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error processing document: {str(e)}")
 
+# Static capability listing, serialized once at import
+_SUPPORTED_TYPES_BODY = orjson.dumps({
+    "image_types": list(SUPPORTED_IMAGE_TYPES),
+    "text_types": list(SUPPORTED_TEXT_TYPES),
+    "vision_models": sorted(VISION_MODELS),
+    "max_sizes": {
+        "images": "10MB",
+        "text_files": "1MB"
+    },
+    "features": {
+        "image_analysis": True,
+        "document_processing": True,
+        "streaming_responses": True,
+        "conversation_history": True
+    }
+})
+
 @router.get("/supported-types")
 async def get_supported_file_types(
     current_user: dict = Depends(get_current_user)
 ):
     """Get list of supported file types for attachments"""
-    return {
-        "image_types": list(SUPPORTED_IMAGE_TYPES),
-        "text_types": list(SUPPORTED_TEXT_TYPES),
-        "vision_models": ["gpt-4o", "gpt-4o-mini", "claude-3-opus-20240229", "claude-3-sonnet-20240229", "gemini-pro-vision"],
-        "max_sizes": {
-            "images": "10MB",
-            "text_files": "1MB"
-        },
-        "features": {
-            "image_analysis": True,
-            "document_processing": True,
-            "streaming_responses": True,
-            "conversation_history": True
-        }
-    }
+    return Response(content=_SUPPORTED_TYPES_BODY, media_type="application/json")
 
 @router.post("/generate-image")
 async def generate_image(
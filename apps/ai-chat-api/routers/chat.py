@@ -1,21 +1,21 @@
-from fastapi import APIRouter, HTTPException, Depends, Request
+from fastapi import APIRouter, HTTPException, Depends, Request, BackgroundTasks
 from fastapi.responses import StreamingResponse
 from typing import AsyncGenerator, List, Dict, Any, Optional
-import json
+import orjson
 import uuid
 from datetime import datetime
 
-from models.chat import ChatRequest, ChatResponse, ChatMessage, MessageRole, ChatConversation
+from models.chat import ChatRequest, ChatResponse, MessageRole, ChatConversation
 from services.litellm_service import litellm_service
-from services.dynamodb import DynamoDBService
+from services.dynamodb import db_service
 from middleware.auth import get_current_user
 
 router = APIRouter()
-db_service = DynamoDBService()
 
 @router.post("/send")
 async def send_message(
     request: ChatRequest,
+    background_tasks: BackgroundTasks,
     current_user: dict = Depends(get_current_user)
 ):
     """Send a message and get AI response"""
@@ -31,9 +31,10 @@ async def send_message(
         # Get or create conversation
         conversation = None
         if request.conversation_id:
-            conversation = await db_service.get_conversation(request.conversation_id, user_id)
-            if not conversation:
+            existing = await db_service.get_conversation(request.conversation_id, user_id)
+            if not existing:
                 raise HTTPException(status_code=404, detail="Conversation not found")
+            conversation = existing.model_dump(mode='json')
         else:
             # Create new conversation
             conversation_id = str(uuid.uuid4())
@@ -53,20 +54,23 @@ async def send_message(
             content=request.message,
             attachments=request.attachments
         )
-        conversation['messages'].append(user_message.dict())
+        conversation['messages'].append(user_message.model_dump(mode='json'))
+        
+        # Existing conversations only need this turn appended, not rewritten
+        is_new = not request.conversation_id
         
         # Generate AI response
         if request.stream:
             return StreamingResponse(
-                stream_chat_response(conversation, request.model_id),
-                media_type="text/plain"
+                stream_chat_response(conversation, request.model_id, is_new),
+                media_type="text/event-stream"
             )
         else:
             # Non-streaming response
             response_text = ""
             async for chunk in litellm_service.generate_response(
                 request.model_id, 
-                [ChatMessage(**msg) for msg in conversation['messages']],
+                conversation['messages'],
                 stream=False
             ):
                 response_text += chunk
@@ -77,11 +81,15 @@ async def send_message(
                 content=response_text,
                 model=request.model_id
             )
-            conversation['messages'].append(ai_message.dict())
+            conversation['messages'].append(ai_message.model_dump(mode='json'))
             conversation['updated_at'] = datetime.utcnow().isoformat()
             
-            # Save conversation
-            await db_service.save_conversation(conversation)
+            # Save conversation after the response is sent
+            background_tasks.add_task(
+                db_service.persist_conversation,
+                conversation,
+                None if is_new else conversation['messages'][-2:]
+            )
             
             return ChatResponse(
                 message=response_text,
@@ -93,7 +101,7 @@ async def send_message(
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-async def stream_chat_response(conversation: dict, model_id: str) -> AsyncGenerator[str, None]:
+async def stream_chat_response(conversation: dict, model_id: str, is_new: bool = True) -> AsyncGenerator[bytes, None]:
     """Stream chat response"""
     try:
         response_text = ""
@@ -101,11 +109,11 @@ async def stream_chat_response(conversation: dict, model_id: str) -> AsyncGenera
         # Generate streaming response
         async for chunk in litellm_service.generate_response(
             model_id,
-            [ChatMessage(**msg) for msg in conversation['messages']],
+            conversation['messages'],
             stream=True
         ):
             response_text += chunk
-            yield f"data: {json.dumps({'content': chunk, 'done': False})}\n\n"
+            yield b"data: %b\n\n" % orjson.dumps({'content': chunk, 'done': False})
         
         # Add AI response to conversation
         ai_message = litellm_service.create_message(
@@ -113,14 +121,16 @@ async def stream_chat_response(conversation: dict, model_id: str) -> AsyncGenera
             content=response_text,
             model=model_id
         )
-        conversation['messages'].append(ai_message.dict())
+        conversation['messages'].append(ai_message.model_dump(mode='json'))
         conversation['updated_at'] = datetime.utcnow().isoformat()
         
-        # Save conversation
-        await db_service.save_conversation(conversation)
-        
-        # Send final response
-        yield f"data: {json.dumps({'content': '', 'done': True, 'conversation_id': conversation['id']})}\n\n"
+        # Queue the save before the final frame; a client disconnecting on
+        # done would otherwise close the generator before it runs
+        db_service.save_conversation_in_background(
+            conversation,
+            None if is_new else conversation['messages'][-2:]
+        )
+        yield b"data: %b\n\n" % orjson.dumps({'content': '', 'done': True, 'conversation_id': conversation['id']})
         
     except Exception as e:
-        yield f"data: {json.dumps({'error': str(e)})}\n\n"
+        yield b"data: %b\n\n" % orjson.dumps({'error': str(e)})
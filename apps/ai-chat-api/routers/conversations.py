@@ -4,11 +4,10 @@ from datetime import datetime
 import uuid
 
 from models.chat import ChatConversation, ConversationTitleUpdateRequest, MessageRole
-from services.dynamodb import DynamoDBService
+from services.dynamodb import db_service
 from middleware.auth import get_current_user
 
 router = APIRouter()
-db_service = DynamoDBService()
 
 @router.get("/", response_model=List[ChatConversation])
 async def get_conversations(
@@ -13,7 +13,7 @@ async def get_available_models(
     """Get all available AI models"""
     try:
         models = litellm_service.get_available_models()
-        return [model.dict() for model in models]
+        return [model.model_dump() for model in models]
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -25,7 +25,7 @@ async def get_model_info(
     """Get information about a specific model"""
     try:
         model_info = litellm_service.get_model_info(model_id)
-        return model_info.dict()
+        return model_info.model_dump()
     except ValueError as e:
         raise HTTPException(status_code=404, detail=str(e))
     except Exception as e:
@@ -40,7 +40,7 @@ async def get_models_by_provider(
     try:
         # Get all models and filter by provider
         all_models = litellm_service.get_available_models()
-        filtered_models = [model.dict() for model in all_models if model.provider.lower() == provider.lower()]
+        filtered_models = [model.model_dump() for model in all_models if model.provider.lower() == provider.lower()]
         return filtered_models
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
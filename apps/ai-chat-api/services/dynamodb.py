@@ -1,22 +1,75 @@
+import asyncio
 import boto3
 import json
+import logging
 from datetime import datetime
 from typing import List, Optional, Dict, Any
+from botocore.config import Config
 from botocore.exceptions import ClientError
 import os
+import time
+from collections import OrderedDict
 
 from models.chat import ChatConversation, ChatMessage, MessageRole
 
+logger = logging.getLogger(__name__)
+
+# In-process read cache for conversations fetched by ID
+CONVERSATION_CACHE_SIZE = 1024
+CONVERSATION_CACHE_TTL = 30  # seconds
+
+# One shared client pool sized for concurrent requests (botocore defaults to 10)
+DYNAMODB_CLIENT_CONFIG = Config(
+    max_pool_connections=64,
+    tcp_keepalive=True,
+    retries={'mode': 'adaptive', 'total_max_attempts': 5}
+)
+
+
+class ConversationCache:
+    """Small LRU cache with a per-entry TTL, keyed on conversation ID"""
+
+    def __init__(self, maxsize: int = CONVERSATION_CACHE_SIZE, ttl: float = CONVERSATION_CACHE_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+
+    def get(self, conversation_id: str) -> Optional[ChatConversation]:
+        entry = self._entries.get(conversation_id)
+        if entry is None:
+            return None
+        expires_at, conversation = entry
+        if expires_at < time.monotonic():
+            del self._entries[conversation_id]
+            return None
+        self._entries.move_to_end(conversation_id)
+        # Callers append to messages before saving; keep the cached list untouched
+        return conversation.model_copy(update={'messages': list(conversation.messages)})
+
+    def put(self, conversation: ChatConversation):
+        self._entries[conversation.id] = (time.monotonic() + self.ttl, conversation)
+        self._entries.move_to_end(conversation.id)
+        if len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, conversation_id: str):
+        self._entries.pop(conversation_id, None)
+
+
 class DynamoDBService:
     def __init__(self):
         # Use preprod profile from local AWS configuration
         session = boto3.Session(profile_name='preprod')
         self.dynamodb = session.resource(
             'dynamodb',
-            region_name=os.getenv('AWS_REGION', 'us-east-1')
+            region_name=os.getenv('AWS_REGION', 'us-east-1'),
+            config=DYNAMODB_CLIENT_CONFIG
         )
         self.table_name = os.getenv('DYNAMODB_TABLE_NAME', 'chat-conversations')
         self.table = self.dynamodb.Table(self.table_name)
+        self._cache = ConversationCache()
+        # Strong references to in-flight background saves so they aren't collected early
+        self._pending_saves = set()
         
         # Ensure table exists
         self._ensure_table_exists()
@@ -96,12 +149,26 @@ class DynamoDBService:
             }
             
             self.table.put_item(Item=item)
+            self._cache.put(conversation)
             return conversation
         except ClientError as e:
             raise Exception(f"Error creating conversation: {e}")
 
     async def get_conversation(self, conversation_id: str, user_id: str) -> Optional[ChatConversation]:
         """Get a conversation by ID"""
+        conversation = await self._get_conversation_by_id(conversation_id)
+        
+        # Verify user ownership
+        if conversation is None or conversation.user_id != user_id:
+            return None
+        return conversation
+
+    async def _get_conversation_by_id(self, conversation_id: str) -> Optional[ChatConversation]:
+        """Get a conversation by ID without an ownership check, served from the cache when fresh"""
+        conversation = self._cache.get(conversation_id)
+        if conversation is not None:
+            return conversation
+        
         try:
             response = self.table.get_item(
                 Key={'id': conversation_id}
@@ -112,11 +179,7 @@ class DynamoDBService:
                 
             item = response['Item']
             
-            # Verify user ownership
-            if item['user_id'] != user_id:
-                return None
-                
-            return ChatConversation(
+            conversation = ChatConversation(
                 id=item['id'],
                 user_id=item['user_id'],
                 title=item['title'],
@@ -138,6 +201,9 @@ class DynamoDBService:
             )
         except ClientError as e:
             raise Exception(f"Error getting conversation: {e}")
+        
+        self._cache.put(conversation)
+        return self._cache.get(conversation_id)
 
     async def update_conversation(self, conversation: ChatConversation) -> ChatConversation:
         """Update an existing conversation"""
@@ -164,6 +230,7 @@ class DynamoDBService:
             }
             
             self.table.put_item(Item=item)
+            self._cache.put(conversation)
             return conversation
         except ClientError as e:
             raise Exception(f"Error updating conversation: {e}")
@@ -215,6 +282,7 @@ class DynamoDBService:
                 return False
                 
             self.table.delete_item(Key={'id': conversation_id})
+            self._cache.invalidate(conversation_id)
             return True
         except ClientError as e:
             raise Exception(f"Error deleting conversation: {e}")
@@ -228,14 +296,69 @@ class DynamoDBService:
             if existing:
                 # Update existing conversation
                 conversation_obj = ChatConversation(**conversation_data)
-                return (await self.update_conversation(conversation_obj)).dict()
+                return (await self.update_conversation(conversation_obj)).model_dump()
             else:
                 # Create new conversation
                 conversation_obj = ChatConversation(**conversation_data)
-                return (await self.create_conversation(conversation_obj)).dict()
+                return (await self.create_conversation(conversation_obj)).model_dump()
         except Exception as e:
             raise Exception(f"Error saving conversation: {e}")
 
+    async def append_messages(self, conversation_id: str, messages: List[Dict[str, Any]], updated_at: Optional[str] = None):
+        """
+        Append messages to an existing conversation without rewriting its history
+        
+        Args:
+            conversation_id: Conversation to append to (must already exist)
+            messages: Message dicts in ChatMessage.model_dump(mode='json') shape
+            updated_at: ISO timestamp for the conversation, defaults to now
+        """
+        try:
+            self.table.update_item(
+                Key={'id': conversation_id},
+                UpdateExpression='SET messages = list_append(if_not_exists(messages, :empty), :new), updated_at = :updated_at',
+                ConditionExpression='attribute_exists(id)',
+                ExpressionAttributeValues={
+                    ':new': [
+                        {
+                            'id': msg['id'],
+                            'role': msg['role'],
+                            'content': msg['content'],
+                            'timestamp': msg['timestamp'],
+                            'model': msg.get('model'),
+                            'metadata': msg.get('metadata') or {}
+                        }
+                        for msg in messages
+                    ],
+                    ':empty': [],
+                    ':updated_at': updated_at or datetime.utcnow().isoformat()
+                }
+            )
+            # The cached copy is missing the new messages
+            self._cache.invalidate(conversation_id)
+        except ClientError as e:
+            raise Exception(f"Error appending messages: {e}")
+
+    async def persist_conversation(self, conversation_data: dict, new_messages: Optional[List[Dict[str, Any]]] = None):
+        """
+        Save a conversation off the request path, logging instead of raising on failure.
+        With new_messages, only those are appended to the stored conversation.
+        """
+        try:
+            if new_messages is None:
+                await self.save_conversation(conversation_data)
+            else:
+                await self.append_messages(conversation_data['id'], new_messages, conversation_data.get('updated_at'))
+        except Exception:
+            logger.exception("Background save failed for conversation %s", conversation_data.get('id'))
+
+    def save_conversation_in_background(self, conversation_data: dict, new_messages: Optional[List[Dict[str, Any]]] = None) -> asyncio.Task:
+        """Schedule persist_conversation on the running loop and return the task"""
+        task = asyncio.create_task(self.persist_conversation(conversation_data, new_messages))
+        self._pending_saves.add(task)
+        task.add_done_callback(self._pending_saves.discard)
+        return task
+
     async def get_user_conversations(self, user_id: str) -> List[ChatConversation]:
         """Get all conversations for a user"""
         try:
@@ -278,6 +401,7 @@ class DynamoDBService:
             self.table.delete_item(
                 Key={'id': conversation_id}
             )
+            self._cache.invalidate(conversation_id)
         except ClientError as e:
             raise Exception(f"Error deleting conversation: {e}")
 
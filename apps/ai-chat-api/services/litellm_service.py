@@ -156,12 +156,12 @@ class LiteLLMService:
     async def generate_response(
         self, 
         model_id: str, 
-        messages: List[ChatMessage], 
+        messages: List[Dict[str, Any]], 
         stream: bool = True,
         temperature: float = 0.7,
         max_tokens: Optional[int] = None
     ) -> AsyncGenerator[str, None]:
-        """Generate AI response using LiteLLM"""
+        """Generate AI response using LiteLLM from message dicts (ChatMessage.model_dump(mode='json') shape)"""
         
         if model_id not in self.models:
             raise ValueError(f"Model {model_id} not found")
@@ -171,24 +171,25 @@ class LiteLLMService:
         # Convert messages to LiteLLM format
         litellm_messages = []
         for msg in messages:
+            attachments = msg.get('attachments')
             # Handle attachments for vision models
-            if msg.attachments and any(att.get('type') == 'image' for att in msg.attachments):
+            if attachments and any(att.get('type') == 'image' for att in attachments):
                 # For vision models, include images in the message content
-                message_content = [{"type": "text", "text": msg.content}]
-                for attachment in msg.attachments:
+                message_content = [{"type": "text", "text": msg['content']}]
+                for attachment in attachments:
                     if attachment.get('type') == 'image' and attachment.get('url'):
                         message_content.append({
                             "type": "image_url",
                             "image_url": {"url": attachment['url']}
                         })
                 litellm_messages.append({
-                    'role': msg.role.value,
+                    'role': msg['role'],
                     'content': message_content
                 })
             else:
                 litellm_messages.append({
-                    'role': msg.role.value,
-                    'content': msg.content
+                    'role': msg['role'],
+                    'content': msg['content']
                 })
         
         # Set max_tokens if not provided